@@ -0,0 +1,19 @@
+#!/bin/bash
+# Apply the versioned migrations in /migrations on a fresh database and record
+# them the same way `python -m src.core.database.migrations` does.
+# Not executable on purpose: the entrypoint sources it, which gives it
+# docker_process_sql.
+
+docker_process_sql --database=playerdata <<-EOSQL
+    CREATE TABLE IF NOT EXISTS schema_migrations (
+        version VARCHAR(100) PRIMARY KEY,
+        applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP
+    );
+EOSQL
+
+for f in /migrations/*.sql; do
+    version=$(basename "$f" .sql)
+    echo "applying migration $version"
+    docker_process_sql --database=playerdata < "$f"
+    docker_process_sql --database=playerdata <<< "INSERT INTO schema_migrations (version) VALUES ('$version');"
+done
@@ -0,0 +1,3 @@
+-- Players are looked up by name for predictions, scores and feedback voters.
+-- name is TEXT, so the index is on a prefix long enough for any jagex name.
+CREATE INDEX idx_players_name ON Players (name(13));
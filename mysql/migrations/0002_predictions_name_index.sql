@@ -0,0 +1,2 @@
+-- get_prediction filters predictions on name.
+CREATE INDEX idx_predictions_name ON Predictions (name);
@@ -0,0 +1,3 @@
+-- get_report_score reads the distinct reportedID of a reporter's non manual
+-- reports, this index covers that without reading the report rows.
+CREATE INDEX idx_reports_reporting_manual_reported ON Reports (reportingID, manual_detect, reportedID);
@@ -0,0 +1,2 @@
+-- get_feedback_score reads the subjects a voter gave feedback on.
+CREATE INDEX idx_feedback_voter_subject ON PredictionsFeedback (voter_id, subject_id);
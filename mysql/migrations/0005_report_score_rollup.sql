@@ -0,0 +1,26 @@
+-- Distinct reported subjects per reporter by ban flags, kept up to date by
+-- src.app.repositories.report_score; flags can be NULL so there is no natural key.
+CREATE TABLE ReportScoreRollup (
+    id BIGINT PRIMARY KEY AUTO_INCREMENT,
+    reporting_id INT NOT NULL,
+    possible_ban BOOLEAN,
+    confirmed_ban BOOLEAN,
+    confirmed_player BOOLEAN,
+    manual_detect SMALLINT,
+    count INT NOT NULL,
+    KEY idx_rollup_reporting (reporting_id)
+);
+
+-- Single row: what the rollup covers, when it was last refreshed and who holds
+-- the refresh lease.
+CREATE TABLE ReportScoreRollupState (
+    id TINYINT PRIMARY KEY,
+    last_report_id BIGINT NOT NULL DEFAULT 0,
+    last_player_update TIMESTAMP NULL,
+    refreshed_at TIMESTAMP NULL,
+    locked_until TIMESTAMP NULL
+);
+INSERT INTO ReportScoreRollupState (id) VALUES (1);
+
+-- players whose flags changed since the last refresh
+CREATE INDEX idx_players_updated_at ON Players (updated_at);
@@ -0,0 +1,5 @@
+-- Keyset pagination of a player's feedback on (ts, id), newest first, as subject
+-- or as voter. id is part of every innodb secondary index, it is listed to make
+-- the order explicit.
+CREATE INDEX idx_feedback_subject_ts ON PredictionsFeedback (subject_id, ts, id);
+CREATE INDEX idx_feedback_voter_ts ON PredictionsFeedback (voter_id, ts, id);
@@ -0,0 +1,3 @@
+-- watch_predictions finds new and rewritten predictions by created, in batches
+-- by (created, id).
+CREATE INDEX idx_predictions_created ON Predictions (created, id);
@@ -1,12 +1,19 @@
 import logging
+from typing import Literal
 
-from fastapi import APIRouter, Depends, HTTPException, status
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, status
 
-from src.app.repositories.feedback import Feedback
+from src.app.repositories.feedback import Feedback, decode_cursor
 from src.app.views.input.feedback import FeedbackInput
+from src.app.views.response.feedback import (
+    FeedbackBatchResponse,
+    FeedbackHistoryItem,
+    FeedbackHistoryResponse,
+)
 from src.app.views.response.ok import Ok
+from src.core import config
 from src.core.fastapi.dependencies.session import get_session
-from src.core.fastapi.dependencies.to_jagex_name import to_jagex_name
+from src.core.fastapi.dependencies.to_jagex_name import jagex_name, to_jagex_name
 
 router = APIRouter(tags=["Feedback"])
 logger = logging.getLogger(__name__)
@@ -17,12 +24,93 @@ async def post_feedback(
     feedback: FeedbackInput,
     session=Depends(get_session),
 ):
-    """ """
+    """
+    Submit a vote.
+
+    With FEEDBACK_BUFFER the vote is written together with the votes of other
+    requests; with FEEDBACK_BUFFER_DURABILITY "buffer" the response does not
+    wait for that write, and a vote that fails to insert is only logged.
+    """
     _feedback = Feedback(session)
 
     feedback.player_name = await to_jagex_name(feedback.player_name)
 
-    success, detail = await _feedback.insert_feedback(feedback=feedback)
+    if config.feedback_buffer is None:
+        success, detail = await _feedback.insert_feedback(feedback=feedback)
+    elif config.settings.FEEDBACK_BUFFER_DURABILITY == "buffer":
+        await config.feedback_buffer.submit(feedback, wait=False)
+        success, detail = True, "success"
+    else:
+        detail = await config.feedback_buffer.submit(feedback)
+        success = detail == "success"
     if not success:
         raise HTTPException(status_code=422, detail=detail)
     return Ok()
+
+
+@router.post(
+    "/feedback/batch",
+    response_model=FeedbackBatchResponse,
+    status_code=status.HTTP_201_CREATED,
+)
+async def post_feedback_batch(
+    feedback: list[FeedbackInput] = Body(
+        ..., min_length=1, max_length=config.settings.FEEDBACK_BATCH_MAX
+    ),
+    session=Depends(get_session),
+):
+    """
+    Submit many votes at once, written with one multi-row insert.
+
+    Votes that are duplicates, or whose voter or subject does not exist, are
+    skipped and counted in the response; the others are inserted.
+    """
+    _feedback = Feedback(session)
+
+    for f in feedback:
+        f.player_name = jagex_name(f.player_name)
+
+    result = await _feedback.insert_feedback_batch(feedback=feedback)
+    return FeedbackBatchResponse(**result)
+
+
+@router.get("/feedback", response_model=FeedbackHistoryResponse)
+async def get_feedback(
+    name: str = Query(
+        ..., min_length=1, max_length=13, description="Name of the player"
+    ),
+    role: Literal["subject", "voter"] = Query(
+        "subject", description="List feedback about the player, or given by the player"
+    ),
+    limit: int = Query(50, ge=1, le=config.settings.FEEDBACK_PAGE_MAX),
+    cursor: str | None = Query(None, description="next_cursor of the previous page"),
+    session=Depends(get_session),
+):
+    """
+    List a player's feedback, newest first, one page at a time.
+
+    Args:
+        name (str): the player
+        role (str): "subject" for feedback about the player, "voter" for feedback given by the player
+        limit (int): page size
+        cursor (str): next_cursor of the previous page, omit for the first page
+
+    Returns:
+        FeedbackHistoryResponse: the page and the cursor of the next page.
+    """
+    _feedback = Feedback(session)
+    name = await to_jagex_name(name)
+    try:
+        position = decode_cursor(cursor) if cursor else None
+    except ValueError:
+        raise HTTPException(status.HTTP_400_BAD_REQUEST, detail="invalid cursor")
+
+    rows, next_cursor = await _feedback.get_feedback_page(
+        player_name=name, role=role, cursor=position, limit=limit
+    )
+    return FeedbackHistoryResponse(
+        items=[
+            FeedbackHistoryItem.model_validate(r, from_attributes=True) for r in rows
+        ],
+        next_cursor=next_cursor,
+    )
@@ -1,20 +1,41 @@
 import asyncio
 import logging
-from typing import Annotated
+from datetime import datetime
+from functools import partial
+from typing import Annotated, AsyncIterator
 
-from fastapi import APIRouter, Depends, HTTPException, Query, status
+import orjson
+from fastapi import APIRouter, Body, Depends, HTTPException, Query, Request, status
+from fastapi.responses import Response, StreamingResponse
 from pydantic.fields import Field
+from sqlalchemy.orm import sessionmaker
 
 from src.app.repositories.player import Player as repoPlayer
 from src.app.views.response.feedback_score import FeedbackScoreResponse
-from src.app.views.response.prediction import PredictionResponse
+from src.app.views.response.player_score import PlayerScoreResponse
+from src.app.views.response.prediction import (
+    PredictionResponse,
+    prediction_to_dict,
+    predictions_to_json,
+)
 from src.app.views.response.report_score import ReportScoreResponse
-from src.core.fastapi.dependencies.session import get_session
-from src.core.fastapi.dependencies.to_jagex_name import to_jagex_name
+from src.core import config
+from src.core.fastapi.dependencies.conditional import (
+    http_date,
+    is_conditional,
+    is_not_modified,
+    make_etag,
+)
+from src.core.fastapi.dependencies.session import get_session, get_session_factory
+from src.core.fastapi.dependencies.to_jagex_name import jagex_name
+from src.core.singleflight import SingleFlight
 
 router = APIRouter(tags=["Player"])
 logger = logging.getLogger(__name__)
 
+# identical lookups that arrive together share one query
+lookups = SingleFlight("player_lookup")
+
 
 @router.get("/player/report/score", response_model=list[ReportScoreResponse])
 async def get_players_kc(
@@ -37,8 +58,11 @@ async def get_players_kc(
         list[ReportScoreResponse]: A list of dictionaries containing KC data for each player.
     """
     repo = repoPlayer(session)
-    names = await asyncio.gather(*[to_jagex_name(n) for n in name])
-    data = await repo.get_report_score(player_names=names)
+    names = [jagex_name(n) for n in name]
+    data = await lookups.do(
+        ("report_score", frozenset(names)),
+        lambda: repo.get_report_score(player_names=names),
+    )
     return data
 
 
@@ -63,13 +87,32 @@ async def get_feedback_score(
         list[FeedbackScoreResponse]: A list of dictionaries containing KC data for each player.
     """
     repo = repoPlayer(session)
-    names = await asyncio.gather(*[to_jagex_name(n) for n in name])
-    data = await repo.get_feedback_score(player_names=names)
+    names = [jagex_name(n) for n in name]
+    data = await lookups.do(
+        ("feedback_score", frozenset(names)),
+        lambda: repo.get_feedback_score(player_names=names),
+    )
     return data
 
 
+def _prediction_version(versions: list[tuple], breakdown: bool) -> tuple:
+    # created changes whenever a new prediction is written for the player
+    etag = make_etag(breakdown, sorted(versions))
+    last_modified = max(created for _, created in versions)
+    return etag, last_modified
+
+
+def _cache_headers(etag: str, last_modified: datetime) -> dict:
+    return {
+        "ETag": etag,
+        "Last-Modified": http_date(last_modified),
+        "Cache-Control": config.settings.PREDICTION_CACHE_CONTROL,
+    }
+
+
 @router.get("/player/prediction", response_model=list[PredictionResponse])
 async def get_prediction(
+    request: Request,
     name: list[Annotated[str, Field(..., min_length=1, max_length=13)]] = Query(
         ...,
         min_length=1,
@@ -93,12 +136,172 @@ async def get_prediction(
     Raises:
         HTTPException: Returns a 404 error with the message "Player not found" if no data is found for the user.
 
+    Responses carry an ETag and Last-Modified from the predictions' created time;
+    a request with a matching If-None-Match or If-Modified-Since gets a 304,
+    checked with a query on just the version columns.
     """
     repo = repoPlayer(session)
-    names = await asyncio.gather(*[to_jagex_name(n) for n in name])
-    data = await repo.get_prediction(player_names=names)
+    names = [jagex_name(n) for n in name]
+    if is_conditional(request):
+        versions = await repo.get_prediction_versions(player_names=names)
+        if versions:
+            etag, last_modified = _prediction_version(versions, breakdown)
+            if is_not_modified(request, etag, last_modified):
+                return Response(
+                    status_code=status.HTTP_304_NOT_MODIFIED,
+                    headers=_cache_headers(etag, last_modified),
+                )
+
+    data = await lookups.do(
+        ("prediction", breakdown, frozenset(names)),
+        lambda: repo.get_prediction(player_names=names, breakdown=breakdown),
+    )
     if not data:
         raise HTTPException(
             status_code=status.HTTP_404_NOT_FOUND, detail="Player not found"
         )
-    return [PredictionResponse.from_data(d, breakdown) for d in data]
+    versions = [(d["id"], d["created"]) for d in data]
+    # the json is built straight from the rows, skipping response_model validation
+    return Response(
+        predictions_to_json(data, breakdown),
+        media_type="application/json",
+        headers=_cache_headers(*_prediction_version(versions, breakdown)),
+    )
+
+
+async def _stream_predictions(
+    session_factory: sessionmaker, names: list[str], breakdown: bool
+) -> AsyncIterator[bytes]:
+    """
+    Query the names in chunks, at most PLAYER_BULK_CONCURRENCY at a time each on
+    its own session, and yield ndjson lines as each chunk completes.
+    """
+    size = config.settings.PLAYER_BULK_CHUNK_SIZE
+    chunks = iter(names[i : i + size] for i in range(0, len(names), size))
+
+    async def query(chunk: list[str]) -> list[dict]:
+        async with session_factory() as session:
+            repo = repoPlayer(session)
+            return await repo.get_prediction(player_names=chunk, breakdown=breakdown)
+
+    pending = set()
+    try:
+        while True:
+            # only start a chunk when a slot frees, bounds the rows held in memory
+            while len(pending) < config.settings.PLAYER_BULK_CONCURRENCY:
+                chunk = next(chunks, None)
+                if chunk is None:
+                    break
+                pending.add(asyncio.ensure_future(query(chunk)))
+            if not pending:
+                return
+
+            done, pending = await asyncio.wait(
+                pending, return_when=asyncio.FIRST_COMPLETED
+            )
+            for task in done:
+                yield b"".join(
+                    orjson.dumps(prediction_to_dict(d, breakdown)) + b"\n"
+                    for d in task.result()
+                )
+    finally:
+        for task in pending:
+            task.cancel()
+
+
+@router.post("/player/prediction/bulk")
+async def post_prediction_bulk(
+    name: list[Annotated[str, Field(..., min_length=1, max_length=13)]] = Body(
+        ...,
+        min_length=1,
+        max_length=config.settings.PLAYER_BULK_MAX_NAMES,
+        description="Names of the players",
+        examples=[["Player1", "Player2"]],
+    ),
+    breakdown: bool = Query(...),
+    session_factory=Depends(get_session_factory),
+):
+    """
+    Get prediction data for many players at once.
+
+    Args:
+        name (list[str]): a json array of up to PLAYER_BULK_MAX_NAMES names.
+        breakdown (bool): A flag indicating whether to include a breakdown of predictions.
+
+    Returns:
+        application/x-ndjson: one PredictionResponse per line, in no particular
+        order, for each player that has a prediction; unknown players are left out.
+    """
+    names = list(dict.fromkeys(jagex_name(n) for n in name))
+    return StreamingResponse(
+        _stream_predictions(session_factory, names, breakdown),
+        media_type="application/x-ndjson",
+    )
+
+
+@router.get("/player/score", response_model=PlayerScoreResponse)
+async def get_player_score(
+    name: list[Annotated[str, Field(..., min_length=1, max_length=13)]] = Query(
+        ...,
+        min_length=1,
+        max_length=5,
+        description="Name of the player",
+        examples=["Player1", "Player2"],
+    ),
+    breakdown: bool = Query(False),
+    session_factory=Depends(get_session_factory),
+):
+    """
+    Get the report score, feedback score and predictions for one or multiple players.
+
+    The three queries run concurrently, each on its own session. A part that takes
+    longer than PLAYER_SCORE_TIMEOUT seconds is returned as null and listed in
+    `timeouts`, so it does not hold up the others.
+
+    Args:
+        name (str): can be provided multiple times
+        breakdown (bool): A flag indicating whether to include a breakdown of predictions.
+
+    Returns:
+        PlayerScoreResponse: the three parts and the parts that timed out.
+    """
+    names = [jagex_name(n) for n in name]
+    key = frozenset(names)
+    parts = {
+        "report_score": repoPlayer.get_report_score,
+        "feedback_score": repoPlayer.get_feedback_score,
+        "prediction": partial(repoPlayer.get_prediction, breakdown=breakdown),
+    }
+
+    async def query(part: str):
+        # the session belongs to the call, a caller that times out can leave
+        async with session_factory() as session:
+            return await parts[part](repoPlayer(session), player_names=names)
+
+    def flight(part: str) -> tuple:
+        # the prediction key matches the one of /player/prediction
+        return ("prediction", breakdown, key) if part == "prediction" else (part, key)
+
+    # the timeout is applied by the single flight, a shared call is not waited for
+    timeout = config.settings.PLAYER_SCORE_TIMEOUT
+    results = await asyncio.gather(
+        *[lookups.do(flight(p), partial(query, p), timeout=timeout) for p in parts],
+        return_exceptions=True,
+    )
+
+    data, timeouts = {}, []
+    for part, result in zip(parts, results):
+        if isinstance(result, asyncio.TimeoutError):
+            logger.warning({"player_score_timeout": part, "names": names})
+            data[part] = None
+            timeouts.append(part)
+        elif isinstance(result, BaseException):
+            raise result
+        else:
+            data[part] = result
+
+    if data["prediction"] is not None:
+        data["prediction"] = [
+            PredictionResponse.from_data(d, breakdown) for d in data["prediction"]
+        ]
+    return PlayerScoreResponse(**data, timeouts=timeouts)
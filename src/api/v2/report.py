@@ -1,22 +1,81 @@
 import logging
 
-from fastapi import APIRouter, status
+from fastapi import APIRouter, Request, status
 from fastapi.exceptions import HTTPException
 
-from src.app.repositories.report import Report
-from src.app.views.input.report import Detection
+from src.app.repositories.report import MAX_DETECTIONS, Report
+from src.app.views.input.report import Detection, detection_from_row
 from src.app.views.response.ok import Ok
+from src.core import config
+from src.core.fastapi.dependencies.stream import (
+    is_msgpack,
+    iter_body_items,
+    iter_msgpack,
+    iter_validated,
+)
+from src.core.rate_limit import RateLimited
 
 logger = logging.getLogger(__name__)
 router = APIRouter(tags=["Report"])
 
 
-@router.post("/report", status_code=status.HTTP_201_CREATED, response_model=Ok)
-async def post_reports(detections: list[Detection]):
+@router.post(
+    "/report",
+    status_code=status.HTTP_201_CREATED,
+    response_model=Ok,
+    openapi_extra={
+        "requestBody": {
+            "required": True,
+            "description": "A json array of detections, ndjson or msgpack rows",
+            "content": {
+                "application/json": {"schema": {"type": "array", "maxItems": 5000}},
+                "application/x-ndjson": {"schema": {"type": "string"}},
+                "application/msgpack": {"schema": {"type": "string"}},
+            },
+        }
+    },
+)
+async def post_reports(request: Request):
+    """
+    Submit detections as a json array, as ndjson or as msgpack.
+
+    The msgpack body is a sequence of rows, one array per detection in the order:
+    reporter, reported, region_id, x_coord, y_coord, z_coord, ts, manual_detect,
+    on_members_world, on_pvp_world, world_number, equip_ge_value, equip_head_id,
+    equip_amulet_id, equip_torso_id, equip_legs_id, equip_boots_id, equip_cape_id,
+    equip_hands_id, equip_weapon_id, equip_shield_id.
+
+    The body is parsed and validated one detection at a time, so oversized or
+    mixed reporter batches are rejected before the rest of the body is read. A
+    rate limited batch is read on to count it, its Retry-After is the time until
+    all of it fits.
+    """
     report = Report()
-    data = await report.parse_data(detections)
+    if is_msgpack(request):
+        rows = iter_validated(iter_msgpack(request.stream()), detection_from_row)
+    else:
+        rows = iter_validated(iter_body_items(request), Detection.model_validate)
+    if config.rate_limiter is not None:
+        rows = config.rate_limiter.limit(
+            rows, key=lambda d: d.reporter, max_rows=MAX_DETECTIONS
+        )
+
+    try:
+        data = await report.parse_stream(rows)
+    except RateLimited as e:
+        raise HTTPException(
+            status.HTTP_429_TOO_MANY_REQUESTS,
+            detail="rate limited",
+            headers={"Retry-After": str(e.retry_after)},
+        )
     if not data:
         raise HTTPException(status.HTTP_400_BAD_REQUEST, detail="invalid data")
+    data = report.aggregate(data)
     logger.debug(f"Working: {len(data)}")
-    await report.send_to_kafka(data)
+    if not await report.send_to_kafka(data):
+        raise HTTPException(
+            status.HTTP_503_SERVICE_UNAVAILABLE,
+            detail="server busy, retry later",
+            headers={"Retry-After": str(config.settings.REPORT_RETRY_AFTER)},
+        )
     return Ok()
@@ -1,68 +1,262 @@
+import base64
+import json
 import logging
+from datetime import datetime
 
-from sqlalchemy import and_, insert, select
+from sqlalchemy import and_, insert, literal, literal_column, or_, select, tuple_
+from sqlalchemy.exc import IntegrityError
 from sqlalchemy.ext.asyncio import AsyncResult, AsyncSession
+from sqlalchemy.orm import sessionmaker
 from sqlalchemy.sql.expression import Insert, Select
 
 from src.app.views.input.feedback import FeedbackInput
 from src.core.database.models.feedback import PredictionFeedback as dbFeedback
 from src.core.database.models.player import Player as dbPlayer
+from src.core.fastapi.dependencies.to_jagex_name import jagex_name
+from src.core.name_index import player_ids
 
 logger = logging.getLogger(__name__)
 
+# mysql error codes
+DUPLICATE_ENTRY = 1062
+NO_REFERENCED_ROW = 1452
+
+
+def encode_cursor(ts: datetime, id: int) -> str:
+    raw = json.dumps([ts.isoformat(), id], separators=(",", ":")).encode()
+    return base64.urlsafe_b64encode(raw).decode().rstrip("=")
+
+
+def decode_cursor(cursor: str) -> tuple[datetime, int]:
+    """
+    Raises ValueError for a cursor that encode_cursor did not make.
+    """
+    try:
+        raw = base64.urlsafe_b64decode(cursor + "=" * (-len(cursor) % 4))
+        ts, id = json.loads(raw)
+        return datetime.fromisoformat(ts), int(id)
+    except (TypeError, ValueError) as e:
+        raise ValueError("invalid cursor") from e
+
+
+def feedback_page_query(
+    column: str, player_id: int, cursor: tuple[datetime, int] | None, limit: int
+) -> Select:
+    """
+    One page of a player's feedback as subject or voter, newest first.
+
+    Pages continue after the (ts, id) of the last row of the previous page, so
+    with the (subject_id, ts, id) and (voter_id, ts, id) indexes every page is
+    an index range read, however deep.
+    """
+    query: Select = select(dbFeedback)
+    query = query.where(getattr(dbFeedback, column) == player_id)
+    if cursor is not None:
+        ts, id = cursor
+        query = query.where(
+            or_(dbFeedback.ts < ts, and_(dbFeedback.ts == ts, dbFeedback.id < id))
+        )
+    query = query.order_by(dbFeedback.ts.desc(), dbFeedback.id.desc())
+    return query.limit(limit)
+
+
+def feedback_row(feedback: FeedbackInput) -> dict:
+    return {
+        "subject_id": feedback.subject_id,
+        "prediction": feedback.prediction,
+        "confidence": feedback.confidence,
+        "vote": feedback.vote,
+        "feedback_text": feedback.feedback_text,
+        "proposed_label": feedback.proposed_label,
+    }
+
 
 class Feedback:
     def __init__(self, session: AsyncSession) -> None:
         self.session = session
 
     async def insert_feedback(self, feedback: FeedbackInput) -> tuple[bool, str]:
-        sql_select: Select = select(dbPlayer.id)
-        sql_select = sql_select.where(dbPlayer.name == feedback.player_name)
-
-        sql_dupe_check: Select = select(dbFeedback)
-        sql_dupe_check = sql_dupe_check.where(
-            and_(
-                dbFeedback.prediction == feedback.prediction,
-                dbFeedback.subject_id == feedback.subject_id,
-            )
-        )
+        """
+        Insert the vote in one statement, with the voter id resolved inside it
+        (or from the name index); the Unique_Vote key catches duplicates.
+        """
+        data = feedback_row(feedback)
+
+        async with self.session:
+            ids = player_ids([feedback.player_name])
+            if ids is not None:
+                sql_insert: Insert = insert(dbFeedback).values(voter_id=ids[0], **data)
+            else:
+                sql_select: Select = select(
+                    dbPlayer.id,
+                    *[literal(v, getattr(dbFeedback, k).type) for k, v in data.items()],
+                )
+                sql_select = sql_select.where(dbPlayer.name == feedback.player_name)
+                # one vote, also where the name is on more than one player
+                sql_select = sql_select.limit(1)
+                sql_insert: Insert = insert(dbFeedback).from_select(
+                    ["voter_id", *data], sql_select
+                )
+
+            try:
+                result: AsyncResult = await self.session.execute(sql_insert)
+            except IntegrityError as e:
+                await self.session.rollback()
+                code = e.orig.args[0] if e.orig and e.orig.args else None
+                if code == DUPLICATE_ENTRY:
+                    logger.info({"duplicate_record": feedback.player_name})
+                    return False, "duplicate_record"
+                if code == NO_REFERENCED_ROW and "FK_Voter_ID" in str(e.orig):
+                    logger.info({"voter_does_not_exist": feedback.player_name})
+                    return False, "voter_does_not_exist"
+                raise
+
+            # the select found no voter, nothing was inserted
+            if result.rowcount == 0:
+                logger.info({"voter_does_not_exist": feedback.player_name})
+                await self.session.rollback()
+                return False, "voter_does_not_exist"
+            await self.session.commit()
+        return True, "success"
 
-        sql_insert: Insert = insert(dbFeedback)
-        data = {
-            "voter_id": None,
-            "subject_id": feedback.subject_id,
-            "prediction": feedback.prediction,
-            "confidence": feedback.confidence,
-            "vote": feedback.vote,
-            "feedback_text": feedback.feedback_text,
-            "proposed_label": feedback.proposed_label,
+    async def insert_feedback_batch(
+        self, feedback: list[FeedbackInput]
+    ) -> dict[str, int]:
+        """
+        Insert many votes, returns how many were inserted and how many were
+        skipped for each reason.
+        """
+        outcomes = await self.insert_feedback_rows(feedback)
+        return {
+            "inserted": outcomes.count("success"),
+            "duplicate_record": outcomes.count("duplicate_record"),
+            "voter_does_not_exist": outcomes.count("voter_does_not_exist"),
+            "subject_does_not_exist": outcomes.count("subject_does_not_exist"),
         }
 
+    async def insert_feedback_rows(self, feedback: list[FeedbackInput]) -> list[str]:
+        """
+        Insert many votes with one multi-row statement, after one select for the
+        voters and subjects. Returns the outcome of each vote: "success",
+        "duplicate_record", "voter_does_not_exist" or "subject_does_not_exist".
+        """
+        names = {f.player_name for f in feedback}
+        subject_ids = {f.subject_id for f in feedback}
+        outcomes: list[str | None] = [None] * len(feedback)
+
+        sql_select: Select = select(dbPlayer.id, dbPlayer.name)
+        sql_select = sql_select.where(
+            or_(dbPlayer.name.in_(names), dbPlayer.id.in_(subject_ids))
+        )
+
         async with self.session:
             result: AsyncResult = await self.session.execute(sql_select)
-            result = result.first()
+            players = result.all()
+            voters = {jagex_name(p.name): p.id for p in players if p.name}
+            subjects = {p.id for p in players}
 
-            # check if voter exists
-            if not result:
-                logger.info({"voter_does_not_exist": FeedbackInput})
-                await self.session.rollback()
-                return False, "voter_does_not_exist"
+            rows, positions = [], {}
+            for i, f in enumerate(feedback):
+                voter_id = voters.get(f.player_name)
+                if voter_id is None:
+                    outcomes[i] = "voter_does_not_exist"
+                    continue
+                if f.subject_id not in subjects:
+                    outcomes[i] = "subject_does_not_exist"
+                    continue
+                key = (f.prediction, f.subject_id, voter_id)
+                if key in positions:
+                    outcomes[i] = "duplicate_record"
+                    continue
+                positions[key] = i
+                rows.append({"voter_id": voter_id, **feedback_row(f)})
 
-            voter_id = result["id"]
-            sql_dupe_check = sql_dupe_check.where(dbFeedback.voter_id == voter_id)
+            if rows:
+                # IGNORE skips the rows that hit Unique_Vote, the rest go in
+                sql_insert: Insert = insert(dbFeedback).prefix_with("IGNORE")
+                result = await self.session.execute(sql_insert.values(rows))
+                inserted = await self._inserted_keys(
+                    list(positions), len(rows), result.rowcount, result.lastrowid
+                )
+                await self.session.commit()
+                for key, i in positions.items():
+                    outcomes[i] = "success" if key in inserted else "duplicate_record"
+        return outcomes
 
-            result: AsyncResult = await self.session.execute(sql_dupe_check)
-            result = result.first()
+    async def _inserted_keys(
+        self, keys: list[tuple], size: int, rowcount: int, first_id: int
+    ) -> set[tuple]:
+        """
+        The Unique_Vote keys that a multi-row insert of `size` rows inserted.
+        """
+        if rowcount == size:
+            return set(keys)
+        if rowcount == 0:
+            return set()
 
-            # check if duplicate record
-            if result:
-                logger.info({"duplicate_record": FeedbackInput, "voter id": voter_id})
-                await self.session.rollback()
-                return False, "duplicate_record"
+        # the ids of one multi-row insert are taken in one block, first_id is
+        # that of the first row inserted and older rows are below it; the ids in
+        # the block are auto_increment_increment apart, read along with the rows
+        sql_select: Select = select(
+            dbFeedback.id,
+            dbFeedback.prediction,
+            dbFeedback.subject_id,
+            dbFeedback.voter_id,
+            literal_column("@@auto_increment_increment").label("increment"),
+        )
+        sql_select = sql_select.where(
+            tuple_(
+                dbFeedback.prediction, dbFeedback.subject_id, dbFeedback.voter_id
+            ).in_(keys)
+        )
+        result: AsyncResult = await self.session.execute(sql_select)
+        return {
+            (r.prediction, r.subject_id, r.voter_id)
+            for r in result.all()
+            if first_id <= r.id < first_id + size * r.increment
+            and (r.id - first_id) % r.increment == 0
+        }
 
-            # add voter_id and insert
-            data["voter_id"] = voter_id
-            sql_insert = sql_insert.values(data)
-            result: AsyncResult = await self.session.execute(sql_insert)
-            await self.session.commit()
-        return True, "success"
+    async def get_feedback_page(
+        self,
+        player_name: str,
+        role: str,
+        cursor: tuple[datetime, int] | None,
+        limit: int,
+    ) -> tuple[list[dbFeedback], str | None]:
+        """
+        A page of feedback for the player as "subject" or "voter", and the
+        cursor of the next page or None on the last one.
+        """
+        sql_select: Select = select(dbPlayer.id)
+        sql_select = sql_select.where(dbPlayer.name == player_name)
+
+        async with self.session:
+            ids = player_ids([player_name])
+            if ids is not None:
+                player_id = ids[0]
+            else:
+                result: AsyncResult = await self.session.execute(sql_select)
+                player_id = result.scalar()
+            if player_id is None:
+                return [], None
+
+            # one extra row tells whether there is a next page
+            query = feedback_page_query(f"{role}_id", player_id, cursor, limit + 1)
+            result: AsyncResult = await self.session.execute(query)
+            rows = list(result.scalars())
+
+        if len(rows) <= limit:
+            return rows, None
+        rows = rows[:limit]
+        return rows, encode_cursor(rows[-1].ts, rows[-1].id)
+
+
+async def write_feedback(
+    session_factory: sessionmaker, feedback: list[FeedbackInput]
+) -> list[str]:
+    """
+    Flush of the feedback write buffer, the votes of many requests on one session.
+    """
+    async with session_factory() as session:
+        return await Feedback(session).insert_feedback_rows(feedback)
@@ -1,32 +1,108 @@
+import asyncio
 import logging
+from array import array
+from datetime import datetime, timedelta
+from decimal import Decimal
 
-from fastapi.encoders import jsonable_encoder
-from sqlalchemy import func, select
+from sqlalchemy import and_, func, or_, select
 from sqlalchemy.ext.asyncio import AsyncResult, AsyncSession
-from sqlalchemy.orm import aliased
+from sqlalchemy.orm import aliased, sessionmaker
 from sqlalchemy.sql.expression import Select
 
+from src.app.repositories.report_score import ReportScore
+from src.app.views.response.prediction import BREAKDOWN_FIELDS, PREDICTION_FIELDS
+from src.core import config
+from src.core.cache import TTLCache, sizeof_dict
 from src.core.database.models.feedback import PredictionFeedback as dbFeedback
 from src.core.database.models.player import Player as dbPlayer
 from src.core.database.models.prediction import Prediction as dbPrediction
 from src.core.database.models.report import Report as dbReport
+from src.core.fastapi.dependencies.to_jagex_name import jagex_name
+from src.core.name_index import player_ids
+from src.core.negative_cache import NegativeCache
 
 logger = logging.getLogger(__name__)
 
+# predictions by normalized name, shared by all requests of this process
+prediction_cache = TTLCache(
+    name="prediction",
+    ttl=config.settings.PREDICTION_CACHE_TTL,
+    max_entries=config.settings.PREDICTION_CACHE_MAX_ENTRIES,
+    max_bytes=config.settings.PREDICTION_CACHE_MAX_BYTES,
+    sizeof=sizeof_dict,
+)
+
+# normalized names without a prediction, so repeated misses skip the database
+missing_predictions = (
+    NegativeCache(
+        name="prediction",
+        ttl=config.settings.PREDICTION_MISSING_TTL,
+        capacity=config.settings.PREDICTION_MISSING_CAPACITY,
+        fp_rate=config.settings.PREDICTION_MISSING_FP_RATE,
+    )
+    if config.settings.PREDICTION_MISSING_CACHE
+    else None
+)
+
+
+def known_missing(player_names: list[str]) -> list[str]:
+    """
+    The names the negative cache is sure enough have no prediction.
+    """
+    if missing_predictions is None:
+        return []
+    return [n for n in player_names if n in missing_predictions]
+
+
+def prediction_columns(breakdown: bool) -> list:
+    """
+    The columns a prediction response needs; with PREDICTION_PACKED_BREAKDOWN the
+    breakdown comes as one comma separated "breakdown" column.
+    """
+    columns = [getattr(dbPrediction, f) for f in PREDICTION_FIELDS]
+    if not breakdown:
+        return columns
+
+    breakdown_columns = [getattr(dbPrediction, f) for f in BREAKDOWN_FIELDS]
+    if not config.settings.PREDICTION_PACKED_BREAKDOWN:
+        return columns + breakdown_columns
+
+    # concat_ws skips nulls, which would shift the values after them
+    packed = func.concat_ws(",", *[func.coalesce(c, 0) for c in breakdown_columns])
+    return columns + [packed.label("breakdown")]
+
+
+def prediction_row(row) -> dict:
+    # decimals as floats, the same values jsonable_encoder gave
+    output = {k: float(v) if type(v) is Decimal else v for k, v in row.items()}
+    if "breakdown" in output:
+        output["breakdown"] = array("d", map(float, output["breakdown"].split(",")))
+    return output
+
 
 class Player:
     def __init__(self, session: AsyncSession) -> None:
         self.session = session
 
     async def get_report_score(self, player_names: tuple[str]):
+        # the rollup is per reporter, distinct counts over several can't be summed
+        if config.settings.REPORT_SCORE_ROLLUP and len(set(player_names)) == 1:
+            data = await ReportScore(self.session).get_score(player_names[0])
+            if data is not None:
+                return data
+
         voter: dbPlayer = aliased(dbPlayer, name="voter")
         subject: dbPlayer = aliased(dbPlayer, name="subject")
 
         sub_query: Select = select(
             dbReport.reportedID.distinct().label("reportedID"), dbReport.manual_detect
         )
-        sub_query = sub_query.join(voter, dbReport.reportingID == voter.id)
-        sub_query = sub_query.where(voter.name.in_(player_names))
+        voter_ids = player_ids(player_names)
+        if voter_ids is not None:
+            sub_query = sub_query.where(dbReport.reportingID.in_(voter_ids))
+        else:
+            sub_query = sub_query.join(voter, dbReport.reportingID == voter.id)
+            sub_query = sub_query.where(voter.name.in_(player_names))
         sub_query = sub_query.where(dbReport.manual_detect == 0)
 
         # Create an alias for the subquery
@@ -67,9 +143,13 @@ class Player:
             fb_subject.confirmed_player,
         )
         query = query.select_from(dbFeedback)
-        query = query.join(fb_voter, dbFeedback.voter_id == fb_voter.id)
         query = query.join(fb_subject, dbFeedback.subject_id == fb_subject.id)
-        query = query.where(fb_voter.name.in_(player_names))
+        voter_ids = player_ids(player_names)
+        if voter_ids is not None:
+            query = query.where(dbFeedback.voter_id.in_(voter_ids))
+        else:
+            query = query.join(fb_voter, dbFeedback.voter_id == fb_voter.id)
+            query = query.where(fb_voter.name.in_(player_names))
         query = query.group_by(
             fb_subject.possible_ban,
             fb_subject.confirmed_ban,
@@ -81,11 +161,139 @@ class Player:
             await self.session.commit()
         return tuple(result.mappings())
 
-    async def get_prediction(self, player_names: list[str]):
-        query: Select = select(dbPrediction)
-        query = query.select_from(dbPrediction)
-        query = query.where(dbPrediction.name.in_(player_names))
-        async with self.session:
-            result: AsyncResult = await self.session.execute(query)
-            result = result.scalars().all()
-        return jsonable_encoder(result)
+    async def get_prediction(self, player_names: list[str], breakdown: bool = True):
+        """
+        Predictions for the normalized player names, served from the prediction
+        cache where possible; only the names that are not cached are queried.
+        Names the negative cache knows have no prediction are not queried either.
+
+        Without breakdown only the columns of the prediction itself are fetched.
+        """
+        cached, missing = prediction_cache.get_many(dict.fromkeys(player_names))
+        skip = known_missing(missing)
+        missing = [n for n in missing if n not in skip]
+        if breakdown:
+            # rows cached by a request without breakdown don't have one
+            summary = len(PREDICTION_FIELDS)
+            missing += [k for k, row in cached.items() if len(row) == summary]
+            cached = {k: row for k, row in cached.items() if len(row) > summary}
+        data = list(cached.values())
+
+        if missing:
+            query: Select = select(*prediction_columns(breakdown))
+            query = query.select_from(dbPrediction)
+            query = query.where(dbPrediction.name.in_(missing))
+            async with self.session:
+                result: AsyncResult = await self.session.execute(query)
+                rows = result.mappings().all()
+
+            found = set()
+            for row in map(prediction_row, rows):
+                name = jagex_name(row["name"])
+                found.add(name)
+                prediction_cache.set(name, row)
+                data.append(row)
+            if missing_predictions is not None:
+                missing_predictions.add(n for n in missing if n not in found)
+
+        # callers may modify the rows, never hand out the cached dicts
+        return [dict(row) for row in data]
+
+    async def get_prediction_versions(self, player_names: list[str]) -> list[tuple]:
+        """
+        The (id, created) of the predictions of the names, from the prediction
+        cache or from a query on just those columns.
+        """
+        cached, missing = prediction_cache.get_many(dict.fromkeys(player_names))
+        versions = [(row["id"], row["created"]) for row in cached.values()]
+        skip = known_missing(missing)
+        missing = [n for n in missing if n not in skip]
+
+        if missing:
+            query: Select = select(dbPrediction.id, dbPrediction.created)
+            query = query.where(dbPrediction.name.in_(missing))
+            async with self.session:
+                result: AsyncResult = await self.session.execute(query)
+                versions.extend(tuple(row) for row in result.all())
+        return versions
+
+    @staticmethod
+    def invalidate_prediction(player_names: list[str]) -> None:
+        """
+        Drop cached predictions, and the names from the negative cache, for when
+        new predictions are written.
+        """
+        names = [jagex_name(n) for n in player_names]
+        prediction_cache.invalidate(names)
+        if missing_predictions is not None:
+            missing_predictions.invalidate(names)
+
+
+async def changed_predictions(
+    session: AsyncSession, since: datetime, batch_size: int
+) -> list:
+    """
+    (id, name, created) of the predictions created at or after `since`, read in
+    batches by (created, id).
+    """
+    rows, after = [], None
+    while True:
+        query = select(dbPrediction.id, dbPrediction.name, dbPrediction.created)
+        query = query.where(dbPrediction.created >= since)
+        if after is not None:
+            created, id = after
+            query = query.where(
+                or_(
+                    dbPrediction.created > created,
+                    and_(dbPrediction.created == created, dbPrediction.id > id),
+                )
+            )
+        query = query.order_by(dbPrediction.created, dbPrediction.id)
+        batch = (await session.execute(query.limit(batch_size))).all()
+        rows.extend(batch)
+        if len(batch) < batch_size:
+            return rows
+        after = (batch[-1].created, batch[-1].id)
+
+
+async def watch_predictions(
+    session_factory: sessionmaker,
+    interval: float,
+    batch_size: int,
+    overlap: float,
+    shutdown_event: asyncio.Event,
+) -> None:
+    """
+    Invalidate the names of predictions written since the last check, every
+    `interval` seconds until shutdown.
+
+    Predictions are found by their created time, which a rewrite of a
+    prediction moves as well; the id is the player's, it says nothing about
+    when a row was written. Every check reads back from `overlap` seconds
+    before the latest created time seen, for rows with the same time or that
+    were committed late, and skips the rows it saw already.
+    """
+    since, seen = None, set()
+    while not shutdown_event.is_set():
+        try:
+            async with session_factory() as session:
+                if since is None:
+                    latest = await session.scalar(
+                        select(func.max(dbPrediction.created))
+                    )
+                    since = latest or datetime(1970, 1, 2)
+                else:
+                    window = since - timedelta(seconds=overlap)
+                    rows = await changed_predictions(session, window, batch_size)
+                    new = [r for r in rows if (r.id, r.created) not in seen]
+                    Player.invalidate_prediction([r.name for r in new if r.name])
+
+                    since = max([since, *[r.created for r in rows]])
+                    window = since - timedelta(seconds=overlap)
+                    seen = {(r.id, r.created) for r in rows if r.created >= window}
+        except Exception as e:
+            logger.error({"prediction_watch_error": str(e)})
+        try:
+            await asyncio.wait_for(shutdown_event.wait(), timeout=interval)
+        except asyncio.TimeoutError:
+            pass
@@ -1,68 +1,230 @@
 import asyncio
 import logging
 import time
+from collections import defaultdict
+from typing import AsyncIterator
 
-from src.app.views.input.report import Detection
-from src.core import config
+from src.app.views.input.report import AggregatedDetection, Detection
+from src.core import config, metrics
 
 logger = logging.getLogger(__name__)
 
+MAX_DETECTIONS = 5000
+MAX_AGE = 25200  # 7 hours ago
+MAX_AHEAD = 3600  # 1 hour in the future
+
+
+class _Run:
+    __slots__ = ("first", "last", "count", "first_ts", "last_ts")
+
+    def __init__(self, d: Detection) -> None:
+        self.first = self.last = d
+        self.count = 1
+        self.first_ts = self.last_ts = d.ts
+
 
 class Report:
     def __init__(self) -> None:
-        pass
+        self.current_time = int(time.time())
+        self.min_ts = self.current_time - MAX_AGE
+        self.max_ts = self.current_time + MAX_AHEAD
+
+    def _reject(self, reason: str) -> None:
+        logger.warning(f"invalid {reason}")
+        metrics.counter(f"report_rejected_batches_{reason}").inc()
+
+    def _count_invalid_rows(self, too_old: int, too_new: int, reporter: str) -> None:
+        if not too_old and not too_new:
+            return
+        metrics.counter("report_rejected_rows_too_old").inc(too_old)
+        metrics.counter("report_rejected_rows_too_new").inc(too_new)
+        logger.info(
+            {
+                "invalid_rows": {"too_old": too_old, "too_new": too_new},
+                "min_ts": self.min_ts,
+                "max_ts": self.max_ts,
+                "reporter": reporter,
+            }
+        )
+
+    async def parse_data(self, data: list[Detection]) -> list[Detection] | None:
+        """
+        Parse and validate a list of detection data, with the same checks as
+        parse_stream.
+        """
+
+        async def rows():
+            for d in data:
+                yield d
 
-    def _check_data_size(self, data: list[Detection]) -> list[Detection] | None:
-        return None if len(data) > 5000 else data
+        return await self.parse_stream(rows())
 
-    def _filter_valid_time(self, data: list[Detection]) -> list[Detection]:
-        current_time = int(time.time())
-        min_ts = current_time - 25200  # 7 hours ago
-        max_ts = current_time + 3600  # 1 hour in the future
-        # [d for d in data if min_ts < d.ts < max_ts]
+    async def parse_stream(
+        self, rows: AsyncIterator[Detection]
+    ) -> list[Detection] | None:
+        """
+        Parse and validate detections as they are read from the request body.
+
+        Applies the same checks as parse_data, but stops reading as soon as the
+        batch is too large or a second reporter shows up.
+        """
+        min_ts, max_ts = self.min_ts, self.max_ts
         output = []
+        reporter = None
+        count = too_old = too_new = 0
+
+        async for d in rows:
+            count += 1
+            if count > MAX_DETECTIONS:
+                self._reject("data_size")
+                return None
 
-        for d in data:
             if d.ts <= min_ts:
-                logger.info(
-                    f"invalid: {d.ts} <= {min_ts}, now={current_time}, {d.reporter}"
-                )
+                too_old += 1
                 continue
             if d.ts >= max_ts:
-                logger.info(
-                    f"invalid: {d.ts} >= {max_ts}, now={current_time}, {d.reporter}"
-                )
+                too_new += 1
                 continue
+
+            if reporter is None:
+                reporter = d.reporter
+            elif d.reporter != reporter:
+                self._reject("unique_reporter")
+                return None
             output.append(d)
 
+        self._count_invalid_rows(too_old, too_new, reporter)
+
+        if not count:
+            self._reject("data_size")
+            return None
+
+        if not output:
+            self._reject("time")
+            return None
+        return output
+
+    def _same_sighting(self, run: _Run, d: Detection) -> bool:
+        settings = config.settings
+        first = run.first
+        return (
+            abs(d.ts - run.last.ts) <= settings.REPORT_AGGREGATE_MAX_GAP
+            and d.z_coord == first.z_coord
+            and abs(d.x_coord - first.x_coord) <= settings.REPORT_AGGREGATE_MAX_DISTANCE
+            and abs(d.y_coord - first.y_coord) <= settings.REPORT_AGGREGATE_MAX_DISTANCE
+            and d.world_number == first.world_number
+            and d.manual_detect == first.manual_detect
+            and d.on_members_world == first.on_members_world
+            and d.on_pvp_world == first.on_pvp_world
+            and (
+                not settings.REPORT_AGGREGATE_MATCH_EQUIPMENT
+                or (
+                    d.equipment == first.equipment
+                    and d.equip_ge_value == first.equip_ge_value
+                )
+            )
+        )
+
+    def aggregate(self, data: list[Detection]) -> list[Detection]:
+        """
+        Collapse runs of sightings of the same player in the same region.
+
+        A sighting joins the open run of its (reported, region_id) when it is
+        within REPORT_AGGREGATE_MAX_GAP seconds of the previous one and within
+        REPORT_AGGREGATE_MAX_DISTANCE tiles of where the run started; with
+        REPORT_AGGREGATE_MATCH_EQUIPMENT the equipment has to be the same too.
+        Runs of one are passed on as is, longer runs become an
+        AggregatedDetection with the count and the first and last timestamp.
+        """
+        if not config.settings.REPORT_AGGREGATE:
+            return data
+
+        runs: list[_Run] = []
+        open_runs: dict[tuple[str, int], _Run] = {}
+        for d in data:
+            key = (d.reported, d.region_id)
+            run = open_runs.get(key)
+            if run is not None and self._same_sighting(run, d):
+                run.last = d
+                run.count += 1
+                run.first_ts = min(run.first_ts, d.ts)
+                run.last_ts = max(run.last_ts, d.ts)
+                continue
+            run = open_runs[key] = _Run(d)
+            runs.append(run)
+
+        output = [
+            (
+                run.first
+                if run.count == 1
+                else AggregatedDetection.model_construct(
+                    **{**run.first.__dict__, "ts": run.first_ts},
+                    count=run.count,
+                    first_ts=run.first_ts,
+                    last_ts=run.last_ts,
+                )
+            )
+            for run in runs
+        ]
+        metrics.counter("report_aggregate_in").inc(len(data))
+        metrics.counter("report_aggregate_out").inc(len(output))
         return output
 
-    def _check_unique_reporter(self, data: list[Detection]) -> list[Detection] | None:
-        return None if len(set(d.reporter for d in data)) > 1 else data
+    @staticmethod
+    def fingerprint(d: Detection) -> tuple:
+        return (d.reporter, d.reported, d.ts, d.region_id)
 
-    async def parse_data(self, data: list[Detection]) -> list[Detection] | None:
+    def to_messages(self, detections: list[dict]) -> list[tuple[str | None, dict]]:
         """
-        Parse and validate a list of detection data.
+        Turn detections into (key, value) kafka messages.
+
+        Messages are keyed by the KAFKA_REPORT_KEY field of the detection, or not
+        keyed. In envelope mode detections that share a key are sent together,
+        at most KAFKA_ENVELOPE_SIZE per message, as {"detections": [...]}.
         """
-        data = self._check_data_size(data)
-        if not data:
-            logger.warning("invalid data size")
-            return None
+        key = config.settings.KAFKA_REPORT_KEY
+        if config.settings.KAFKA_REPORT_FORMAT == "detection":
+            return [(d[key] if key else None, d) for d in detections]
 
-        data = self._filter_valid_time(data)
-        if not data:
-            logger.warning("invalid time")
-            return None
+        groups: dict[str | None, list[dict]] = defaultdict(list)
+        for d in detections:
+            groups[d[key] if key else None].append(d)
 
-        data = self._check_unique_reporter(data)
-        if not data:
-            logger.warning("invalid unique reporter")
-            return None
-        return data
+        size = config.settings.KAFKA_ENVELOPE_SIZE
+        return [
+            (k, {"detections": group[i : i + size]})
+            for k, group in groups.items()
+            for i in range(0, len(group), size)
+        ]
 
-    async def send_to_kafka(self, data: list[Detection]) -> None:
-        detections = [d.model_dump(mode="json") for d in data]
-        await asyncio.gather(
-            *[config.send_queue.put(detection) for detection in detections]
-        )
-        return
+    async def send_to_kafka(self, data: list[Detection]) -> bool:
+        """
+        Queue the detections for kafka.
+
+        Detections already sent within the dedupe window are dropped first.
+        With admission control a batch that does not fit in the send queue or the
+        in-flight budget goes to the local spool, or is rejected without waiting
+        when there is no room there either.
+        """
+        fingerprints = None
+        if config.report_filter is not None:
+            data, fingerprints = config.report_filter.filter(data)
+            if not data:
+                return True
+
+        messages = self.to_messages([d.model_dump(mode="json") for d in data])
+        if config.settings.REPORT_ADMISSION_CONTROL:
+            # when the queue is full, the spool takes the batch if it can
+            admitted = config.send_queue.try_put_batch(messages)
+            if not admitted:
+                metrics.counter("report_rejected_detections").inc(len(data))
+            if not admitted and not (
+                config.spool and await config.spool.append(messages)
+            ):
+                return False
+        else:
+            await asyncio.gather(*[config.send_queue.put(m) for m in messages])
+
+        if fingerprints:
+            config.report_filter.add(fingerprints)
+        return True
@@ -0,0 +1,337 @@
+"""
+Per reporter rollup of the report score.
+
+The rollup holds, for every reporter, the number of distinct players it
+reported by (possible_ban, confirmed_ban, confirmed_player, manual_detect),
+the same numbers Player.get_report_score computes from Reports on every call.
+
+A refresh recomputes the reporters that are dirty since the last one: those
+with reports past the last seen Reports.ID, and those that reported a player
+whose Players.updated_at moved (its flags may have changed). One api replica at
+a time refreshes, it holds a lease in ReportScoreRollupState while it does.
+
+Both marks are high-water marks, and a report or player update can commit after
+a later one was seen. A refresh therefore looks back
+REPORT_SCORE_ROLLUP_ID_MARGIN ids and REPORT_SCORE_ROLLUP_LAG seconds below the
+marks as well; recomputing a reporter twice is harmless.
+
+    python -m src.app.repositories.report_score rebuild
+    python -m src.app.repositories.report_score refresh
+    python -m src.app.repositories.report_score check [--sample N]
+"""
+
+import argparse
+import asyncio
+import logging
+import sys
+from datetime import datetime, timedelta
+
+from sqlalchemy import delete, func, insert, literal_column, or_, select, union, update
+from sqlalchemy.ext.asyncio import AsyncResult, AsyncSession
+from sqlalchemy.orm import aliased
+from sqlalchemy.sql.expression import CompoundSelect, Select
+
+from src.core import config, metrics
+from src.core.database.models.player import Player as dbPlayer
+from src.core.database.models.report import Report as dbReport
+from src.core.database.models.report_score import ReportScoreRollup as dbRollup
+from src.core.database.models.report_score import (
+    ReportScoreRollupState as dbRollupState,
+)
+from src.core.name_index import player_ids
+
+logger = logging.getLogger(__name__)
+
+STATE_ID = 1
+LEASE_SECONDS = 600
+SCORE_COLUMNS = ("possible_ban", "confirmed_ban", "confirmed_player", "manual_detect")
+
+
+def score_query(reporter_ids: list[int]) -> Select:
+    """
+    The report score of each reporter, grouped like get_report_score.
+    """
+    subject: dbPlayer = aliased(dbPlayer, name="subject")
+
+    reports = select(
+        dbReport.reportingID, dbReport.reportedID, dbReport.manual_detect
+    ).distinct()
+    reports = reports.where(dbReport.reportingID.in_(reporter_ids))
+    reports = reports.where(dbReport.manual_detect == 0)
+    reports = reports.subquery("DistinctReports")
+
+    query: Select = select(
+        reports.c.reportingID,
+        subject.possible_ban,
+        subject.confirmed_ban,
+        subject.confirmed_player,
+        reports.c.manual_detect,
+        func.count(func.distinct(subject.id)).label("count"),
+    )
+    query = query.select_from(reports)
+    query = query.join(subject, reports.c.reportedID == subject.id)
+    query = query.group_by(
+        reports.c.reportingID,
+        subject.possible_ban,
+        subject.confirmed_ban,
+        subject.confirmed_player,
+        reports.c.manual_detect,
+    )
+    return query
+
+
+def dirty_reporters_query(
+    last_id: int, max_id: int, last_update: datetime, max_update: datetime | None
+) -> CompoundSelect:
+    """
+    The reporters with reports in (last_id, max_id], and those that reported a
+    player updated in (last_update, max_update].
+    """
+    new_reports = select(dbReport.reportingID)
+    new_reports = new_reports.where(dbReport.ID > last_id)
+    new_reports = new_reports.where(dbReport.ID <= max_id)
+
+    changed = select(dbReport.reportingID)
+    changed = changed.join(dbPlayer, dbReport.reportedID == dbPlayer.id)
+    changed = changed.where(dbPlayer.updated_at > last_update)
+    changed = changed.where(dbPlayer.updated_at <= max_update)
+    return union(new_reports, changed)
+
+
+class ReportScore:
+    def __init__(self, session: AsyncSession) -> None:
+        self.session = session
+
+    async def get_score(self, player_name: str) -> tuple | None:
+        """
+        The report score of one reporter from the rollup, or None when the
+        rollup is older than REPORT_SCORE_MAX_STALENESS seconds.
+        """
+        state_query = select(dbRollupState.refreshed_at, func.now().label("now"))
+        state_query = state_query.where(dbRollupState.id == STATE_ID)
+
+        voter: dbPlayer = aliased(dbPlayer, name="voter")
+        query: Select = select(
+            dbRollup.count, *[getattr(dbRollup, c) for c in SCORE_COLUMNS]
+        )
+        voter_ids = player_ids([player_name])
+        if voter_ids is not None:
+            query = query.where(dbRollup.reporting_id == voter_ids[0])
+        else:
+            query = query.join(voter, dbRollup.reporting_id == voter.id)
+            query = query.where(voter.name == player_name)
+
+        max_staleness = timedelta(seconds=config.settings.REPORT_SCORE_MAX_STALENESS)
+        async with self.session:
+            result: AsyncResult = await self.session.execute(state_query)
+            state = result.first()
+            if state is None or state.refreshed_at is None:
+                return None
+            if state.refreshed_at < state.now - max_staleness:
+                metrics.counter("report_score_rollup_stale").inc()
+                return None
+
+            result: AsyncResult = await self.session.execute(query)
+            await self.session.commit()
+        metrics.counter("report_score_rollup_served").inc()
+        return tuple(result.mappings())
+
+    async def _acquire_lease(self) -> bool:
+        sql = update(dbRollupState)
+        sql = sql.where(dbRollupState.id == STATE_ID)
+        sql = sql.where(
+            or_(
+                dbRollupState.locked_until.is_(None),
+                dbRollupState.locked_until < func.now(),
+            )
+        )
+        sql = sql.values(
+            locked_until=func.date_add(
+                func.now(), literal_column(f"INTERVAL {LEASE_SECONDS} SECOND")
+            )
+        )
+        result = await self.session.execute(sql)
+        await self.session.commit()
+        return result.rowcount == 1
+
+    async def _release_lease(self, **values) -> None:
+        sql = update(dbRollupState).where(dbRollupState.id == STATE_ID)
+        await self.session.execute(sql.values(locked_until=None, **values))
+        await self.session.commit()
+
+    async def _high_water_marks(self) -> tuple[int, object]:
+        max_id = await self.session.scalar(select(func.max(dbReport.ID)))
+        max_update = await self.session.scalar(select(func.max(dbPlayer.updated_at)))
+        return max_id or 0, max_update
+
+    async def _recompute(self, reporter_ids: list[int]) -> None:
+        """
+        Replace the rollup rows of the reporters, a chunk per transaction.
+        """
+        size = config.settings.REPORT_SCORE_ROLLUP_CHUNK
+        columns = ["reporting_id", *SCORE_COLUMNS, "count"]
+        for i in range(0, len(reporter_ids), size):
+            chunk = reporter_ids[i : i + size]
+            await self.session.execute(
+                delete(dbRollup).where(dbRollup.reporting_id.in_(chunk))
+            )
+            await self.session.execute(
+                insert(dbRollup).from_select(columns, score_query(chunk))
+            )
+            await self.session.commit()
+        metrics.counter("report_score_rollup_recomputed").inc(len(reporter_ids))
+
+    async def refresh(self) -> int | None:
+        """
+        Recompute the dirty reporters, returns how many or None when another
+        replica holds the lease. Rebuilds when the rollup was never built.
+        """
+        async with self.session:
+            if not await self._acquire_lease():
+                return None
+            state = await self.session.get(dbRollupState, STATE_ID)
+            if state.refreshed_at is None:
+                return await self._rebuild()
+
+            # players without an update time yet, count from the start
+            last_update = state.last_player_update or datetime(1970, 1, 2)
+            # for rows that committed after the marks were taken
+            last_update -= timedelta(seconds=config.settings.REPORT_SCORE_ROLLUP_LAG)
+            last_id = (
+                state.last_report_id - config.settings.REPORT_SCORE_ROLLUP_ID_MARGIN
+            )
+            try:
+                max_id, max_update = await self._high_water_marks()
+                query = dirty_reporters_query(last_id, max_id, last_update, max_update)
+                result = await self.session.execute(query)
+                reporter_ids = sorted(result.scalars())
+                await self._recompute(reporter_ids)
+            except BaseException:
+                await self.session.rollback()
+                await self._release_lease()
+                raise
+
+            await self._release_lease(
+                last_report_id=max_id,
+                last_player_update=max_update,
+                refreshed_at=func.now(),
+            )
+        logger.info({"report_score_rollup_refreshed": len(reporter_ids)})
+        return len(reporter_ids)
+
+    async def rebuild(self) -> int | None:
+        """
+        Recompute every reporter, returns how many or None when another replica
+        holds the lease.
+        """
+        async with self.session:
+            if not await self._acquire_lease():
+                return None
+            return await self._rebuild()
+
+    async def _rebuild(self) -> int:
+        try:
+            # reports and player updates during the rebuild are picked up by the
+            # next refresh
+            max_id, max_update = await self._high_water_marks()
+            await self.session.execute(delete(dbRollup))
+            await self.session.commit()
+
+            result = await self.session.execute(select(dbReport.reportingID).distinct())
+            reporter_ids = sorted(result.scalars())
+            await self._recompute(reporter_ids)
+        except BaseException:
+            await self.session.rollback()
+            await self._release_lease()
+            raise
+
+        await self._release_lease(
+            last_report_id=max_id,
+            last_player_update=max_update,
+            refreshed_at=func.now(),
+        )
+        logger.info({"report_score_rollup_rebuilt": len(reporter_ids)})
+        return len(reporter_ids)
+
+    async def check(self, sample: int = 1000) -> list[int]:
+        """
+        Compare the rollup of a random sample of reporters with the live
+        query, returns the reporters that do not match.
+        """
+
+        def scores(rows) -> dict[int, set]:
+            output: dict[int, set] = {}
+            for row in rows:
+                key = tuple(row[c] for c in SCORE_COLUMNS)
+                output.setdefault(row["reporting_id"], set()).add((key, row["count"]))
+            return output
+
+        async with self.session:
+            ids = select(dbRollup.reporting_id).distinct()
+            ids = ids.order_by(func.rand()).limit(sample)
+            result = await self.session.execute(ids)
+            reporter_ids = list(result.scalars())
+            if not reporter_ids:
+                return []
+
+            rollup = select(dbRollup)
+            rollup = rollup.where(dbRollup.reporting_id.in_(reporter_ids))
+            result = await self.session.execute(rollup)
+            stored = scores(
+                {c: getattr(r, c) for c in ("reporting_id", *SCORE_COLUMNS, "count")}
+                for r in result.scalars()
+            )
+
+            result = await self.session.execute(score_query(reporter_ids))
+            live = scores(
+                {**row, "reporting_id": row["reportingID"]} for row in result.mappings()
+            )
+            await self.session.commit()
+
+        return [i for i in reporter_ids if stored.get(i) != live.get(i)]
+
+
+async def refresh_periodically(shutdown_event: asyncio.Event) -> None:
+    """
+    Refresh the rollup every REPORT_SCORE_ROLLUP_INTERVAL seconds until shutdown.
+    """
+    from src.core.database.database import SessionFactory
+
+    interval = config.settings.REPORT_SCORE_ROLLUP_INTERVAL
+    while not shutdown_event.is_set():
+        try:
+            async with SessionFactory() as session:
+                await ReportScore(session).refresh()
+        except Exception as e:
+            logger.error({"report_score_rollup_error": str(e)})
+        try:
+            await asyncio.wait_for(shutdown_event.wait(), timeout=interval)
+        except asyncio.TimeoutError:
+            pass
+
+
+async def main(argv: list[str]) -> int:
+    from src.core.database.database import SessionFactory, engine
+
+    parser = argparse.ArgumentParser(prog="python -m " + __spec__.name)
+    parser.add_argument("command", choices=["rebuild", "refresh", "check"])
+    parser.add_argument("--sample", type=int, default=1000)
+    args = parser.parse_args(argv)
+
+    async with SessionFactory() as session:
+        repo = ReportScore(session)
+        if args.command == "check":
+            mismatches = await repo.check(sample=args.sample)
+            logger.info({"report_score_rollup_mismatches": mismatches})
+            status = 1 if mismatches else 0
+        else:
+            count = await getattr(repo, args.command)()
+            if count is None:
+                logger.warning("another process holds the rollup lease")
+            status = 0 if count is not None else 1
+    await engine.dispose()
+    return status
+
+
+if __name__ == "__main__":
+    sys.exit(asyncio.run(main(sys.argv[1:])))
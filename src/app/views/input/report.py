@@ -1,7 +1,9 @@
+from collections import namedtuple
 from typing import Optional
 
-from pydantic import BaseModel
+from pydantic import BaseModel, ValidationError
 from pydantic.fields import Field
+from pydantic_core import PydanticCustomError
 
 
 class Equipment(BaseModel):
@@ -30,3 +32,76 @@ class Detection(BaseModel):
     world_number: int = Field(0, ge=300, le=1_000)
     equipment: Equipment
     equip_ge_value: int = Field(0, ge=0)
+
+
+class AggregatedDetection(Detection):
+    """
+    A run of sightings of the same player collapsed into one detection,
+    `ts` is the first sighting.
+    """
+
+    count: int = Field(1, ge=1)
+    first_ts: int = Field(0, ge=0)
+    last_ts: int = Field(0, ge=0)
+
+
+# field order of a detection row in the compact (msgpack) format,
+# the equipment fields are flattened into the end of the row
+DETECTION_FIELDS = (
+    "reporter",
+    "reported",
+    "region_id",
+    "x_coord",
+    "y_coord",
+    "z_coord",
+    "ts",
+    "manual_detect",
+    "on_members_world",
+    "on_pvp_world",
+    "world_number",
+    "equip_ge_value",
+)
+EQUIPMENT_FIELDS = (
+    "equip_head_id",
+    "equip_amulet_id",
+    "equip_torso_id",
+    "equip_legs_id",
+    "equip_boots_id",
+    "equip_cape_id",
+    "equip_hands_id",
+    "equip_weapon_id",
+    "equip_shield_id",
+)
+COMPACT_FIELDS = DETECTION_FIELDS + EQUIPMENT_FIELDS
+
+
+class CompactDetection(namedtuple("CompactDetection", COMPACT_FIELDS)):
+    """
+    A detection row in the compact format, shaped so it validates into a
+    Detection with `from_attributes=True`, without building intermediate dicts.
+    """
+
+    __slots__ = ()
+
+    @property
+    def equipment(self) -> "CompactDetection":
+        return self
+
+
+def detection_from_row(row: tuple | list) -> Detection:
+    if not isinstance(row, (tuple, list)) or len(row) != len(COMPACT_FIELDS):
+        raise ValidationError.from_exception_data(
+            "Detection",
+            [
+                {
+                    "type": PydanticCustomError(
+                        "row_type",
+                        "Input should be an array of {length} values",
+                        {"length": len(COMPACT_FIELDS)},
+                    ),
+                    "loc": (),
+                    "input": row,
+                }
+            ],
+        )
+    return Detection.model_validate(CompactDetection._make(row), from_attributes=True)
@@ -1,3 +1,4 @@
+from datetime import datetime
 from typing import Optional
 
 from pydantic import BaseModel, Field
@@ -9,3 +10,30 @@ class FeedbackScore(BaseModel):
     confirmed_ban: bool
     confirmed_player: bool
     vote: Optional[int] = Field(None, ge=-1, le=1)
+
+
+class FeedbackHistoryItem(BaseModel):
+    id: int
+    ts: datetime
+    voter_id: int
+    subject_id: int
+    prediction: str
+    confidence: float
+    vote: int
+    feedback_text: Optional[str]
+    reviewed: bool
+    proposed_label: Optional[str]
+
+
+class FeedbackBatchResponse(BaseModel):
+    inserted: int
+    duplicate_record: int
+    voter_does_not_exist: int
+    subject_does_not_exist: int
+
+
+class FeedbackHistoryResponse(BaseModel):
+    items: list[FeedbackHistoryItem]
+    next_cursor: Optional[str] = Field(
+        None, description="Pass as cursor to get the next page, null on the last page"
+    )
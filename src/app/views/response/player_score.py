@@ -0,0 +1,12 @@
+from pydantic import BaseModel
+
+from src.app.views.response.feedback_score import FeedbackScoreResponse
+from src.app.views.response.prediction import PredictionResponse
+from src.app.views.response.report_score import ReportScoreResponse
+
+
+class PlayerScoreResponse(BaseModel):
+    report_score: list[ReportScoreResponse] | None
+    feedback_score: list[FeedbackScoreResponse] | None
+    prediction: list[PredictionResponse] | None
+    timeouts: list[str]
@@ -1,7 +1,74 @@
 from datetime import datetime
 
+import orjson
 from pydantic import BaseModel
 
+PREDICTION_FIELDS = ("id", "name", "prediction", "predicted_confidence", "created")
+# order of the packed breakdown, a row's "breakdown" array holds these confidences
+BREAKDOWN_FIELDS = (
+    "real_player",
+    "pvm_melee_bot",
+    "smithing_bot",
+    "magic_bot",
+    "fishing_bot",
+    "mining_bot",
+    "crafting_bot",
+    "pvm_ranged_magic_bot",
+    "pvm_ranged_bot",
+    "hunter_bot",
+    "fletching_bot",
+    "clue_scroll_bot",
+    "lms_bot",
+    "agility_bot",
+    "wintertodt_bot",
+    "runecrafting_bot",
+    "zalcano_bot",
+    "woodcutting_bot",
+    "thieving_bot",
+    "soul_wars_bot",
+    "cooking_bot",
+    "vorkath_bot",
+    "barrows_bot",
+    "herblore_bot",
+    "zulrah_bot",
+    "gauntlet_bot",
+    "nex_bot",
+    "unknown_bot",
+)
+
+
+def _breakdown(data: dict) -> dict:
+    if "breakdown" in data:
+        values = zip(BREAKDOWN_FIELDS, data["breakdown"])
+    else:
+        values = ((k, v) for k, v in data.items() if k not in PREDICTION_FIELDS)
+    return {k: v / 100.0 if v > 0 else v for k, v in values}
+
+
+def prediction_to_dict(data: dict, breakdown: bool) -> dict:
+    """
+    The PredictionResponse fields of a prediction row, without validation.
+
+    The row holds the breakdown either as one column per label, or packed in
+    a "breakdown" array in BREAKDOWN_FIELDS order.
+    """
+    return {
+        "player_id": data["id"],
+        "player_name": data["name"],
+        "prediction_label": data["prediction"].lower(),
+        "prediction_confidence": data["predicted_confidence"] / 100.0,
+        "created": data["created"],
+        "predictions_breakdown": _breakdown(data) if breakdown else {},
+    }
+
+
+def predictions_to_json(rows: list[dict], breakdown: bool) -> bytes:
+    """
+    Serialize prediction rows straight to the json of list[PredictionResponse],
+    the rows must hold floats and datetimes as Player.get_prediction returns them.
+    """
+    return orjson.dumps([prediction_to_dict(row, breakdown) for row in rows])
+
 
 class PredictionResponse(BaseModel):
     player_id: int
@@ -13,18 +80,4 @@ class PredictionResponse(BaseModel):
 
     @classmethod
     def from_data(self, data: dict, breakdown: bool):
-        # Create the player data dictionary with only the relevant fields
-        player_data = {
-            "player_id": data.pop("id"),
-            "player_name": data.pop("name"),
-            "prediction_label": data.pop("prediction").lower(),
-            "prediction_confidence": data.pop("predicted_confidence") / 100.0,
-            "created": data.pop("created"),
-            "predictions_breakdown": (
-                {k: v / 100.0 if v > 0 else v for k, v in data.items()}
-                if breakdown
-                else {}
-            ),
-        }
-
-        return self(**player_data)
+        return self(**prediction_to_dict(data, breakdown))
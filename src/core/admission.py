@@ -0,0 +1,49 @@
+import asyncio
+import sys
+
+from src.core import metrics
+
+
+class AdmissionQueue(asyncio.Queue):
+    """
+    asyncio.Queue that admits or rejects a whole batch without waiting.
+
+    Items count as in-flight from the moment they are put on the queue until the
+    consumer calls task_done, so `max_inflight` also covers what the sender has
+    taken off the queue but not yet delivered.
+    """
+
+    def __init__(self, maxsize: int = 0, max_inflight: int = 0) -> None:
+        super().__init__(maxsize=maxsize)
+        self.max_inflight = max_inflight
+        self.inflight = 0
+        self.rejected_batches = metrics.counter("report_rejected_batches")
+        self.rejected_items = metrics.counter("report_rejected_messages")
+        metrics.gauge("report_queue_depth", fn=self.qsize)
+        metrics.gauge("report_inflight", fn=lambda: self.inflight)
+
+    def put_nowait(self, item) -> None:
+        super().put_nowait(item)
+        self.inflight += 1
+
+    def task_done(self) -> None:
+        super().task_done()
+        self.inflight -= 1
+
+    def free(self) -> int:
+        return self.maxsize - self.qsize() if self.maxsize > 0 else sys.maxsize
+
+    def try_put_batch(self, items: list) -> bool:
+        """
+        Put all items on the queue, or none of them if they don't fit.
+        """
+        size = len(items)
+        over_budget = self.max_inflight and self.inflight + size > self.max_inflight
+        if size > self.free() or over_budget:
+            self.rejected_batches.inc()
+            self.rejected_items.inc(size)
+            return False
+
+        for item in items:
+            self.put_nowait(item)
+        return True
@@ -0,0 +1,96 @@
+import sys
+import time
+from collections import OrderedDict
+from typing import Any, Callable, Hashable, Iterable
+
+from src.core import metrics
+
+
+def sizeof_dict(value: dict) -> int:
+    """
+    Rough size of a flat dict, keys are assumed to be shared column names.
+    """
+    return sys.getsizeof(value) + sum(sys.getsizeof(v) for v in value.values())
+
+
+class TTLCache:
+    """
+    Least recently used cache whose entries also expire `ttl` seconds after
+    they were set. Bounded both in entries and in (estimated) bytes.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        ttl: float,
+        max_entries: int,
+        max_bytes: int = 0,
+        sizeof: Callable[[Any], int] = sys.getsizeof,
+    ) -> None:
+        self.ttl = ttl
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.sizeof = sizeof
+        self.bytes = 0
+        self._data: OrderedDict[Hashable, tuple[float, int, Any]] = OrderedDict()
+
+        self.hits = metrics.counter(f"{name}_cache_hits")
+        self.misses = metrics.counter(f"{name}_cache_misses")
+        self.evictions = metrics.counter(f"{name}_cache_evictions")
+        metrics.gauge(f"{name}_cache_entries", fn=lambda: len(self._data))
+        metrics.gauge(f"{name}_cache_bytes", fn=lambda: self.bytes)
+
+    def __len__(self) -> int:
+        return len(self._data)
+
+    def _pop(self, key: Hashable) -> None:
+        _, size, _ = self._data.pop(key)
+        self.bytes -= size
+
+    def get(self, key: Hashable, default=None):
+        entry = self._data.get(key)
+        if entry is None or entry[0] < time.monotonic():
+            if entry is not None:
+                self._pop(key)
+            self.misses.inc()
+            return default
+
+        self._data.move_to_end(key)
+        self.hits.inc()
+        return entry[2]
+
+    def get_many(self, keys: Iterable[Hashable]) -> tuple[dict, list]:
+        """
+        Returns the cached values by key, and the keys that were not cached.
+        """
+        found, missing = {}, []
+        for key in keys:
+            value = self.get(key, default=self)
+            if value is self:
+                missing.append(key)
+            else:
+                found[key] = value
+        return found, missing
+
+    def set(self, key: Hashable, value: Any) -> None:
+        if key in self._data:
+            self._pop(key)
+
+        size = self.sizeof(value)
+        self._data[key] = (time.monotonic() + self.ttl, size, value)
+        self.bytes += size
+
+        while len(self._data) > self.max_entries or (
+            self.max_bytes and self.bytes > self.max_bytes
+        ):
+            self._pop(next(iter(self._data)))
+            self.evictions.inc()
+
+    def invalidate(self, keys: Iterable[Hashable]) -> None:
+        for key in keys:
+            if key in self._data:
+                self._pop(key)
+
+    def clear(self) -> None:
+        self._data.clear()
+        self.bytes = 0
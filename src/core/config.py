@@ -1,4 +1,5 @@
 import asyncio
+from typing import Literal
 
 from pydantic_settings import BaseSettings
 
@@ -9,9 +10,74 @@ class Settings(BaseSettings):
     KAFKA_HOST: str
     POOL_RECYCLE: int
     POOL_TIMEOUT: int
+    POOL_SIZE: int = 5
+    POOL_MAX_OVERFLOW: int = 10
+    POOL_WARM_UP: int = 0
+    KAFKA_BATCH_SIZE: int = 500
+    KAFKA_LINGER_MS: int = 50
+    KAFKA_MAX_BATCH_SIZE: int = 524_288
+    KAFKA_REPORT_FORMAT: Literal["detection", "envelope"] = "detection"
+    KAFKA_REPORT_KEY: Literal["", "reported", "reporter"] = ""
+    KAFKA_ENVELOPE_SIZE: int = 500
+    REPORT_QUEUE_SIZE: int = 10_000
+    REPORT_MAX_INFLIGHT: int = 20_000
+    REPORT_ADMISSION_CONTROL: bool = True
+    REPORT_RETRY_AFTER: int = 5
+    REPORT_AGGREGATE: bool = False
+    REPORT_AGGREGATE_MAX_DISTANCE: int = 2
+    REPORT_AGGREGATE_MAX_GAP: int = 60
+    REPORT_AGGREGATE_MATCH_EQUIPMENT: bool = True
+    REPORT_DEDUPE_WINDOW: int = 300
+    REPORT_DEDUPE_MAX_ENTRIES: int = 1_000_000
+    # off when empty; point it at a persistent volume, the spool has to survive
+    # a restart to be of use
+    REPORT_SPOOL_DIR: str = ""
+    REPORT_SPOOL_SEGMENT_BYTES: int = 16_777_216
+    REPORT_SPOOL_MAX_BYTES: int = 1_073_741_824
+    REPORT_SPOOL_FSYNC_INTERVAL: float = 1.0
+    REPORT_SHUTDOWN_TIMEOUT: int = 20
+    REPORT_RATE_LIMIT: float = 100
+    REPORT_RATE_LIMIT_BURST: int = 10_000
+    RATE_LIMIT_REDIS_URL: str = ""
+    PREDICTION_CACHE_TTL: int = 300
+    PREDICTION_CACHE_MAX_ENTRIES: int = 100_000
+    PREDICTION_CACHE_MAX_BYTES: int = 134_217_728
+    PREDICTION_PACKED_BREAKDOWN: bool = False
+    PREDICTION_CACHE_CONTROL: str = "public, max-age=60"
+    PREDICTION_MISSING_CACHE: bool = False
+    PREDICTION_MISSING_TTL: int = 600
+    PREDICTION_MISSING_CAPACITY: int = 1_000_000
+    PREDICTION_MISSING_FP_RATE: float = 0.001
+    PREDICTION_WATCH_INTERVAL: int = 10
+    PREDICTION_WATCH_OVERLAP: int = 60
+    FEEDBACK_PAGE_MAX: int = 200
+    FEEDBACK_BATCH_MAX: int = 500
+    FEEDBACK_BUFFER: bool = False
+    FEEDBACK_BUFFER_MAX_ROWS: int = 200
+    FEEDBACK_BUFFER_MAX_DELAY_MS: float = 5
+    FEEDBACK_BUFFER_MAX_PENDING: int = 10_000
+    FEEDBACK_BUFFER_DURABILITY: Literal["commit", "buffer"] = "commit"
+    PLAYER_NAME_INDEX: bool = False
+    PLAYER_NAME_INDEX_REFRESH: int = 30
+    PLAYER_NAME_INDEX_BATCH: int = 100_000
+    PLAYER_BULK_MAX_NAMES: int = 5000
+    PLAYER_BULK_CHUNK_SIZE: int = 250
+    PLAYER_BULK_CONCURRENCY: int = 4
+    PLAYER_SCORE_TIMEOUT: float = 2.0
+    REPORT_SCORE_ROLLUP: bool = False
+    REPORT_SCORE_ROLLUP_INTERVAL: int = 60
+    REPORT_SCORE_ROLLUP_CHUNK: int = 500
+    REPORT_SCORE_ROLLUP_ID_MARGIN: int = 10_000
+    REPORT_SCORE_ROLLUP_LAG: int = 120
+    REPORT_SCORE_MAX_STALENESS: int = 300
 
 
 settings = Settings()
 producer = None
 send_queue = None
+report_filter = None
+spool = None
+rate_limiter = None
+name_index = None
+feedback_buffer = None
 sd_event = asyncio.Event()
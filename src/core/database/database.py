@@ -2,15 +2,20 @@ from sqlalchemy.ext.asyncio import AsyncSession, create_async_engine
 from sqlalchemy.orm import declarative_base, sessionmaker
 
 from src.core.config import settings
+from src.core.database.pool import InstrumentedPool, instrument
 
 # Create an async SQLAlchemy engine
 engine = create_async_engine(
     settings.DATABASE_URL,
+    poolclass=InstrumentedPool,
+    pool_size=settings.POOL_SIZE,
+    max_overflow=settings.POOL_MAX_OVERFLOW,
     pool_timeout=settings.POOL_TIMEOUT,
     pool_recycle=settings.POOL_RECYCLE,
     echo=(settings.ENV != "PRD"),
     pool_pre_ping=True,
 )
+instrument(engine)
 
 # Create a session factory
 SessionFactory = sessionmaker(
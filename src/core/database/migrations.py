@@ -0,0 +1,75 @@
+"""
+Versioned schema migrations.
+
+Each file in mysql/migrations is one version, applied in file name order and
+recorded in the schema_migrations table so it is applied only once. Run with:
+
+    python -m src.core.database.migrations
+"""
+
+import asyncio
+import logging
+from pathlib import Path
+
+from sqlalchemy import text
+from sqlalchemy.ext.asyncio import AsyncEngine
+
+logger = logging.getLogger(__name__)
+
+MIGRATIONS_DIR = Path(__file__).parents[3] / "mysql" / "migrations"
+
+
+def statements(sql: str) -> list[str]:
+    """
+    Split a migration file in statements, migrations do not use custom delimiters.
+    """
+    lines = [line for line in sql.splitlines() if not line.strip().startswith("--")]
+    return [s.strip() for s in "\n".join(lines).split(";") if s.strip()]
+
+
+async def migrate(engine: AsyncEngine, path: Path = MIGRATIONS_DIR) -> list[str]:
+    """
+    Apply the migrations that were not applied yet, returns their versions.
+    """
+    if not path.is_dir():
+        # an image without the migrations would otherwise apply nothing
+        raise FileNotFoundError(f"no migrations directory at {path}")
+    async with engine.begin() as conn:
+        await conn.execute(
+            text(
+                "CREATE TABLE IF NOT EXISTS schema_migrations ("
+                "version VARCHAR(100) PRIMARY KEY, "
+                "applied_at TIMESTAMP NOT NULL DEFAULT CURRENT_TIMESTAMP)"
+            )
+        )
+        result = await conn.execute(text("SELECT version FROM schema_migrations"))
+        applied = set(result.scalars())
+
+    versions = []
+    for file in sorted(path.glob("*.sql")):
+        version = file.stem
+        if version in applied:
+            continue
+        logger.info({"migration": version})
+        # mysql commits ddl implicitly, a failed migration is not recorded
+        async with engine.begin() as conn:
+            for statement in statements(file.read_text()):
+                await conn.execute(text(statement))
+            await conn.execute(
+                text("INSERT INTO schema_migrations (version) VALUES (:version)"),
+                {"version": version},
+            )
+        versions.append(version)
+    return versions
+
+
+async def main() -> None:
+    from src.core.database.database import engine
+
+    versions = await migrate(engine)
+    logger.info({"applied_migrations": versions})
+    await engine.dispose()
+
+
+if __name__ == "__main__":
+    asyncio.run(main())
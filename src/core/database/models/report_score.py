@@ -0,0 +1,25 @@
+from sqlalchemy import TIMESTAMP, BigInteger, Boolean, Column, Integer, SmallInteger
+
+from src.core.database.database import Base
+
+
+class ReportScoreRollup(Base):
+    __tablename__ = "ReportScoreRollup"
+
+    id = Column(BigInteger, primary_key=True, autoincrement=True)
+    reporting_id = Column(Integer, nullable=False)
+    possible_ban = Column(Boolean)
+    confirmed_ban = Column(Boolean)
+    confirmed_player = Column(Boolean)
+    manual_detect = Column(SmallInteger)
+    count = Column(Integer, nullable=False)
+
+
+class ReportScoreRollupState(Base):
+    __tablename__ = "ReportScoreRollupState"
+
+    id = Column(SmallInteger, primary_key=True)
+    last_report_id = Column(BigInteger, nullable=False, server_default="0")
+    last_player_update = Column(TIMESTAMP)
+    refreshed_at = Column(TIMESTAMP)
+    locked_until = Column(TIMESTAMP)
@@ -0,0 +1,74 @@
+import asyncio
+import logging
+import time
+
+from sqlalchemy import event
+from sqlalchemy.engine import ExceptionContext
+from sqlalchemy.ext.asyncio import AsyncEngine
+from sqlalchemy.pool import AsyncAdaptedQueuePool
+
+from src.core import metrics
+
+logger = logging.getLogger(__name__)
+
+checkout_wait = metrics.histogram("db_pool_checkout_seconds")
+
+
+class InstrumentedPool(AsyncAdaptedQueuePool):
+    """
+    Queue pool that times checkouts, from asking for a connection until getting
+    one: the wait for a free connection, or the connect of a new one.
+    """
+
+    def _do_get(self):
+        start = time.perf_counter()
+        try:
+            return super()._do_get()
+        finally:
+            checkout_wait.observe(time.perf_counter() - start)
+
+
+def instrument(engine: AsyncEngine) -> None:
+    """
+    Gauges of the engine's pool, and a counter of failed pre-pings.
+    """
+    # read the pool on every snapshot, dispose replaces it
+    pool = lambda: engine.sync_engine.pool  # noqa: E731
+    metrics.gauge("db_pool_size", fn=lambda: pool().size())
+    metrics.gauge("db_pool_in_use", fn=lambda: pool().checkedout())
+    metrics.gauge("db_pool_idle", fn=lambda: pool().checkedin())
+    # overflow() counts from -pool_size while the pool is not full yet
+    metrics.gauge("db_pool_overflow", fn=lambda: max(0, pool().overflow()))
+    pre_ping_failures = metrics.counter("db_pool_pre_ping_failures")
+
+    @event.listens_for(engine.sync_engine, "handle_error")
+    def count_pre_ping_failure(context: ExceptionContext) -> None:
+        if context.is_pre_ping:
+            pre_ping_failures.inc()
+
+
+async def warm_up(engine: AsyncEngine, count: int) -> int:
+    """
+    Open `count` connections at once and return them to the pool, so the first
+    requests don't pay for the connect. Returns how many were opened.
+    """
+    if count <= 0:
+        return 0
+    start = time.perf_counter()
+    results = await asyncio.gather(
+        *[engine.connect().start() for _ in range(count)], return_exceptions=True
+    )
+    connections = [r for r in results if not isinstance(r, BaseException)]
+    for connection in connections:
+        await connection.close()
+
+    errors = [str(r) for r in results if isinstance(r, BaseException)]
+    if errors:
+        logger.warning({"db_pool_warm_up_errors": errors[:5], "failed": len(errors)})
+    logger.info(
+        {
+            "db_pool_warmed_up": len(connections),
+            "seconds": round(time.perf_counter() - start, 3),
+        }
+    )
+    return len(connections)
@@ -0,0 +1,73 @@
+import time
+from typing import Callable, Hashable, Iterable
+
+from src.core import metrics
+
+
+class DedupeFilter:
+    """
+    Drops items whose fingerprint was already accepted in the last `window` seconds.
+
+    Fingerprints are kept in two generations of sets that rotate every `window`
+    seconds, so a fingerprint is remembered for between one and two windows.
+    A generation also rotates when it holds half of `max_entries`, which caps
+    memory at the cost of a shorter window under heavy traffic.
+    """
+
+    def __init__(
+        self, key: Callable[..., Hashable], window: float, max_entries: int
+    ) -> None:
+        self.key = key
+        self.window = window
+        self.max_generation = max(1, max_entries // 2)
+        self.current: set[int] = set()
+        self.previous: set[int] = set()
+        self.rotated_at = time.monotonic()
+
+        self.checked = metrics.counter("report_dedupe_checked")
+        self.dropped = metrics.counter("report_dedupe_dropped")
+        metrics.gauge("report_dedupe_entries", fn=lambda: len(self))
+        metrics.gauge("report_dedupe_hit_rate", fn=self.hit_rate)
+
+    def __len__(self) -> int:
+        return len(self.current) + len(self.previous)
+
+    def hit_rate(self) -> float:
+        return self.dropped.value / self.checked.value if self.checked.value else 0
+
+    def _rotate(self) -> None:
+        now = time.monotonic()
+        age = now - self.rotated_at
+        if age >= 2 * self.window:
+            self.previous, self.current = set(), set()
+        elif age >= self.window or len(self.current) >= self.max_generation:
+            self.previous, self.current = self.current, set()
+        else:
+            return
+        self.rotated_at = now
+
+    def filter(self, items: list) -> tuple[list, list[int]]:
+        """
+        Returns the items not seen before, and their fingerprints.
+
+        The fingerprints are only remembered once passed to `add`, so a batch
+        that is rejected further down the pipeline can be retried.
+        """
+        self._rotate()
+        current, previous = self.current, self.previous
+        seen: set[int] = set()
+        output = []
+
+        for item in items:
+            fingerprint = hash(self.key(item))
+            if fingerprint in seen or fingerprint in current or fingerprint in previous:
+                continue
+            seen.add(fingerprint)
+            output.append(item)
+
+        self.checked.inc(len(items))
+        self.dropped.inc(len(items) - len(output))
+        return output, list(seen)
+
+    def add(self, fingerprints: Iterable[int]) -> None:
+        self.current.update(fingerprints)
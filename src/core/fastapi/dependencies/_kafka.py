@@ -8,10 +8,29 @@ from asyncio import Event, Queue
 
 from aiokafka import AIOKafkaConsumer, AIOKafkaProducer
 
-from src.core import config
+from src.core import config, metrics
+from src.core.spool import Spool
 
 logger = logging.getLogger(__name__)
 
+batch_latency = metrics.histogram("kafka_send_batch_latency_seconds")
+batch_size_hist = metrics.histogram(
+    "kafka_send_batch_size", buckets=(1, 10, 50, 100, 250, 500, 1000, 5000)
+)
+sent_messages = metrics.counter("kafka_sent_messages")
+sent_detections = metrics.counter("kafka_sent_detections")
+
+
+def detection_count(messages: list) -> int:
+    """
+    Count the detections in (key, value) messages, an envelope counts as the
+    detections it carries.
+    """
+    return sum(
+        len(v["detections"]) if isinstance(v, dict) and "detections" in v else 1
+        for _, v in messages
+    )
+
 
 def print_traceback(_, error):
     error_type = type(error)
@@ -64,13 +83,13 @@ def log_speed(
         # Return the original start time and the current counter value
         return start_time, counter
 
-    # Calculate the processing speed (messages per second)
+    # Calculate the processing speed (detections per second)
     speed = counter / delta_time
 
     # Log the processing speed and relevant information
     log_message = (
         f"{topic=}, qsize={_queue.qsize()}, "
-        f"processed {counter} in {delta_time:.2f} seconds, {speed:.2f} msg/sec"
+        f"processed {counter} in {delta_time:.2f} seconds, {speed:.2f} detections/sec"
     )
     logger.info(log_message)
 
@@ -100,8 +119,11 @@ async def kafka_producer():
 
     producer = AIOKafkaProducer(
         bootstrap_servers=[config.settings.KAFKA_HOST],
+        key_serializer=lambda k: k.encode() if k is not None else None,
         value_serializer=lambda v: json.dumps(v).encode(),
         acks="all",
+        linger_ms=config.settings.KAFKA_LINGER_MS,
+        max_batch_size=config.settings.KAFKA_MAX_BATCH_SIZE,
     )
     await producer.start()
     logger.info("Started")
@@ -126,31 +148,152 @@ async def receive_messages(
     logger.info("shutdown")
 
 
+async def send_batch(producer: AIOKafkaProducer, topic: str, messages: list) -> None:
+    """
+    Enqueue (key, value) messages in the producer, then wait for delivery at once.
+    """
+    futures = [await producer.send(topic, key=k, value=v) for k, v in messages]
+    await asyncio.gather(*futures)
+
+
+async def get_batch(
+    _queue: Queue, batch_size: int, linger_ms: int, timeout: float = 1
+) -> list:
+    """
+    Wait up to `timeout` seconds for a first message, then keep draining the queue
+    until `batch_size` messages are collected or `linger_ms` has passed.
+    """
+    try:
+        batch = [await asyncio.wait_for(_queue.get(), timeout=timeout)]
+    except asyncio.TimeoutError:
+        return []
+
+    loop = asyncio.get_running_loop()
+    deadline = loop.time() + linger_ms / 1000
+
+    while len(batch) < batch_size:
+        if not _queue.empty():
+            batch.append(_queue.get_nowait())
+            continue
+
+        remaining = deadline - loop.time()
+        if remaining <= 0:
+            break
+
+        try:
+            batch.append(await asyncio.wait_for(_queue.get(), timeout=remaining))
+        except asyncio.TimeoutError:
+            break
+    return batch
+
+
 @retry(max_retries=3, retry_delay=5, on_failure=print_traceback)
 async def send_messages(
     topic: str,
     producer: AIOKafkaProducer,
     send_queue: Queue,
     shutdown_event: Event,
+    batch_size: int = 500,
+    linger_ms: int = 50,
+    spool: Spool | None = None,
 ):
     start_time = time.time()
-    messages_sent = 0
+    detections_sent = 0
 
     while not shutdown_event.is_set():
-        start_time, messages_sent = log_speed(
-            counter=messages_sent,
+        start_time, detections_sent = log_speed(
+            counter=detections_sent,
             start_time=start_time,
             _queue=send_queue,
             topic=topic,
         )
-        if send_queue.empty():
+        batch = await get_batch(
+            _queue=send_queue, batch_size=batch_size, linger_ms=linger_ms
+        )
+        if not batch:
+            continue
+
+        detections = detection_count(batch)
+        batch_start = time.perf_counter()
+        try:
+            await send_batch(producer, topic, batch)
+        except Exception as e:
+            if spool is None or not await spool.append(batch):
+                raise
+            logger.warning(
+                {"error": str(e), "spooled": len(batch), "detections": detections}
+            )
+        else:
+            sent_messages.inc(len(batch))
+            sent_detections.inc(detections)
+        finally:
+            for _ in batch:
+                send_queue.task_done()
+        latency = time.perf_counter() - batch_start
+
+        batch_latency.observe(latency)
+        batch_size_hist.observe(len(batch))
+        logger.debug({"topic": topic, "batch": len(batch), "latency": f"{latency:.4f}"})
+
+        detections_sent += detections
+
+    logger.info("shutdown")
+
+
+async def replay_spool(
+    topic: str,
+    producer: AIOKafkaProducer,
+    spool: Spool,
+    shutdown_event: Event,
+    batch_size: int = 500,
+    retry_delay: int = 5,
+):
+    """
+    Send spooled messages to kafka in the order they were spooled.
+    """
+    while not shutdown_event.is_set():
+        batch = await spool.read_batch(max_messages=batch_size)
+        if batch is None:
             await asyncio.sleep(1)
             continue
 
-        message = await send_queue.get()
-        await producer.send(topic, value=message)
-        send_queue.task_done()
+        segment, offset, messages = batch
+        try:
+            await send_batch(producer, topic, messages)
+        except Exception as e:
+            logger.warning({"error": str(e), "spool_replay_failed": len(messages)})
+            await asyncio.sleep(retry_delay)
+            continue
 
-        messages_sent += 1
+        await spool.commit(segment, offset, count=len(messages))
+        logger.info(
+            {
+                "topic": topic,
+                "replayed": len(messages),
+                "detections": detection_count(messages),
+            }
+        )
 
     logger.info("shutdown")
+
+
+async def drain(send_queue: Queue, spool: Spool | None, timeout: float) -> None:
+    """
+    Give the sender `timeout` seconds to empty the send queue, then move what is
+    left to the spool.
+    """
+    try:
+        await asyncio.wait_for(send_queue.join(), timeout=timeout)
+        return
+    except asyncio.TimeoutError:
+        pass
+
+    leftover = []
+    while not send_queue.empty():
+        leftover.append(send_queue.get_nowait())
+        send_queue.task_done()
+
+    if leftover and (spool is None or not await spool.append(leftover)):
+        logger.error(
+            {"lost_on_shutdown": len(leftover), "detections": detection_count(leftover)}
+        )
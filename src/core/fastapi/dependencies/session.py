@@ -1,4 +1,5 @@
 from sqlalchemy.ext.asyncio import AsyncSession
+from sqlalchemy.orm import sessionmaker
 
 from src.core.database.database import SessionFactory
 
@@ -7,3 +8,8 @@ from src.core.database.database import SessionFactory
 async def get_session() -> AsyncSession:
     async with SessionFactory() as session:
         yield session
+
+
+# Dependency for endpoints that run queries concurrently, one session per query
+def get_session_factory() -> sessionmaker:
+    return SessionFactory
@@ -0,0 +1,182 @@
+import codecs
+import json
+from typing import AsyncIterator, Callable
+
+import msgpack
+from fastapi import Request
+from fastapi.exceptions import RequestValidationError
+from pydantic import ValidationError
+
+NDJSON_TYPES = ("application/x-ndjson", "application/ndjson", "application/jsonl")
+MSGPACK_TYPES = (
+    "application/msgpack",
+    "application/x-msgpack",
+    "application/vnd.msgpack",
+)
+
+_decoder = json.JSONDecoder()
+_whitespace = " \t\n\r"
+
+
+def _invalid(msg: str) -> RequestValidationError:
+    return RequestValidationError(
+        [{"type": "json_invalid", "loc": ("body",), "msg": msg, "input": {}}]
+    )
+
+
+def _content_type(request: Request) -> str:
+    content_type = request.headers.get("content-type", "")
+    return content_type.split(";")[0].strip().lower()
+
+
+def is_ndjson(request: Request) -> bool:
+    return _content_type(request) in NDJSON_TYPES
+
+
+def is_msgpack(request: Request) -> bool:
+    return _content_type(request) in MSGPACK_TYPES
+
+
+async def iter_ndjson(
+    chunks: AsyncIterator[bytes], max_item_size: int = 65_536
+) -> AsyncIterator:
+    """
+    Yield one decoded json value per non blank line of the body.
+    """
+    buffer = b""
+    async for chunk in chunks:
+        buffer += chunk
+        *lines, buffer = buffer.split(b"\n")
+        for line in lines:
+            if line.strip():
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    raise _invalid("invalid json line")
+        if len(buffer) > max_item_size:
+            raise _invalid("json line too large")
+
+    if buffer.strip():
+        try:
+            yield json.loads(buffer)
+        except ValueError:
+            raise _invalid("invalid json line")
+
+
+async def iter_json_array(
+    chunks: AsyncIterator[bytes], max_item_size: int = 65_536
+) -> AsyncIterator:
+    """
+    Yield the items of a top level json array as soon as each one is complete,
+    without holding more than one item of the body in memory.
+    """
+    utf8 = codecs.getincrementaldecoder("utf-8")()
+    buffer, started, done, expect_item = "", False, False, True
+    # a ',' needs a value after it, unlike the '[' of an empty array
+    after_comma = False
+
+    async def _chunks():
+        async for chunk in chunks:
+            yield utf8.decode(chunk), False
+        yield utf8.decode(b"", final=True), True
+
+    async for text, final in _chunks():
+        buffer += text
+        pos = 0
+        while True:
+            while pos < len(buffer) and buffer[pos] in _whitespace:
+                pos += 1
+            if pos == len(buffer):
+                break
+            if done:
+                raise _invalid("unexpected data after json array")
+            if not started:
+                if buffer[pos] != "[":
+                    raise _invalid("expected a json array")
+                started, pos = True, pos + 1
+                continue
+            if buffer[pos] == "]":
+                if after_comma:
+                    raise _invalid("expected a value after ','")
+                done, pos = True, pos + 1
+                continue
+            if not expect_item:
+                if buffer[pos] != ",":
+                    raise _invalid("expected ',' or ']'")
+                expect_item, after_comma, pos = True, True, pos + 1
+                continue
+            if buffer[pos] == ",":
+                raise _invalid("expected a value")
+            try:
+                item, end = _decoder.raw_decode(buffer, pos)
+            except ValueError:
+                break
+            # a value running to the end of the buffer (a number) may continue
+            if end == len(buffer) and not final:
+                break
+            yield item
+            expect_item, after_comma, pos = False, False, end
+
+        buffer = buffer[pos:]
+        if len(buffer) > max_item_size:
+            raise _invalid("json item too large")
+
+    if buffer.strip() or not done:
+        raise _invalid("invalid or incomplete json array")
+
+
+async def iter_msgpack(
+    chunks: AsyncIterator[bytes],
+    max_item_size: int = 65_536,
+    slice_size: int = 65_536,
+) -> AsyncIterator[tuple]:
+    """
+    Yield each msgpack value of a body made of consecutive msgpack values,
+    arrays are decoded as tuples.
+    """
+    # the buffer holds what is left of an incomplete item plus one slice
+    unpacker = msgpack.Unpacker(
+        use_list=False, raw=False, max_buffer_size=max_item_size + slice_size
+    )
+    # tell() also moves over a partially decoded value, so track the end of the
+    # last complete one to detect a truncated body
+    received = consumed = 0
+    try:
+        async for chunk in chunks:
+            # chunks can be far larger than an item, feed them a slice at a time
+            for start in range(0, len(chunk), slice_size):
+                data = chunk[start : start + slice_size]
+                received += len(data)
+                unpacker.feed(data)
+                for item in unpacker:
+                    consumed = unpacker.tell()
+                    yield item
+                if received - consumed > max_item_size:
+                    raise _invalid("msgpack item too large")
+    except (msgpack.BufferFull, msgpack.ExtraData, ValueError):
+        raise _invalid("invalid msgpack")
+
+    if consumed != received:
+        raise _invalid("incomplete msgpack")
+
+
+def iter_body_items(request: Request) -> AsyncIterator:
+    if is_ndjson(request):
+        return iter_ndjson(request.stream())
+    return iter_json_array(request.stream())
+
+
+async def iter_validated(items: AsyncIterator, validate: Callable) -> AsyncIterator:
+    """
+    Validate items one at a time, reporting errors like fastapi does for a list body.
+    """
+    index = 0
+    async for item in items:
+        try:
+            yield validate(item)
+        except ValidationError as e:
+            errors = e.errors(include_url=False)
+            raise RequestValidationError(
+                [{**err, "loc": ("body", index, *err["loc"])} for err in errors]
+            )
+        index += 1
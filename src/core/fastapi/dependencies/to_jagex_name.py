@@ -1,3 +1,7 @@
+def jagex_name(name: str) -> str:
+    return name.lower().replace("_", " ").replace("-", " ").strip()
+
+
 # Define the to_jagex_name dependency
 async def to_jagex_name(name: str) -> str:
-    return name.lower().replace("_", " ").replace("-", " ").strip()
+    return jagex_name(name)
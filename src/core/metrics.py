@@ -0,0 +1,92 @@
+import bisect
+from typing import Callable
+
+DEFAULT_BUCKETS = (0.001, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+
+
+class Counter:
+    def __init__(self) -> None:
+        self.value = 0
+
+    def inc(self, amount: int = 1) -> None:
+        self.value += amount
+
+    def snapshot(self) -> int:
+        return self.value
+
+
+class Gauge:
+    """
+    A value that can go up and down, either set explicitly or read from a callback.
+    """
+
+    def __init__(self, fn: Callable[[], float] | None = None) -> None:
+        self.value = 0
+        self.fn = fn
+
+    def set(self, value: float) -> None:
+        self.value = value
+
+    def inc(self, amount: float = 1) -> None:
+        self.value += amount
+
+    def dec(self, amount: float = 1) -> None:
+        self.value -= amount
+
+    def snapshot(self) -> float:
+        return self.fn() if self.fn else self.value
+
+
+class Histogram:
+    """
+    Cumulative bucket histogram, same layout as a prometheus histogram.
+    """
+
+    def __init__(self, buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> None:
+        self.buckets = tuple(sorted(buckets))
+        self.counts = [0] * (len(self.buckets) + 1)
+        self.count = 0
+        self.sum = 0.0
+
+    def observe(self, value: float) -> None:
+        self.counts[bisect.bisect_left(self.buckets, value)] += 1
+        self.count += 1
+        self.sum += value
+
+    def snapshot(self) -> dict:
+        cumulative, total = {}, 0
+        for bound, count in zip((*self.buckets, "+Inf"), self.counts):
+            total += count
+            cumulative[str(bound)] = total
+        return {"count": self.count, "sum": self.sum, "buckets": cumulative}
+
+
+_registry: dict[str, Counter | Gauge | Histogram] = {}
+
+
+def _get_or_create(name: str, factory: Callable, kind: type):
+    metric = _registry.get(name)
+    if metric is None:
+        metric = _registry[name] = factory()
+    if not isinstance(metric, kind):
+        raise TypeError(f"metric {name} is a {type(metric).__name__}")
+    return metric
+
+
+def counter(name: str) -> Counter:
+    return _get_or_create(name, Counter, Counter)
+
+
+def gauge(name: str, fn: Callable[[], float] | None = None) -> Gauge:
+    metric = _get_or_create(name, lambda: Gauge(fn), Gauge)
+    if fn is not None:
+        metric.fn = fn
+    return metric
+
+
+def histogram(name: str, buckets: tuple[float, ...] = DEFAULT_BUCKETS) -> Histogram:
+    return _get_or_create(name, lambda: Histogram(buckets), Histogram)
+
+
+def snapshot() -> dict:
+    return {name: metric.snapshot() for name, metric in sorted(_registry.items())}
@@ -0,0 +1,339 @@
+import asyncio
+import logging
+import sys
+import time
+from array import array
+from bisect import bisect_left
+from datetime import datetime
+from typing import Iterable
+
+from sqlalchemy import and_, or_, select
+from sqlalchemy.orm import sessionmaker
+from sqlalchemy.sql.expression import Select
+
+from src.core import config, metrics
+from src.core.database.models.player import Player as dbPlayer
+from src.core.fastapi.dependencies.to_jagex_name import jagex_name
+
+logger = logging.getLogger(__name__)
+
+# the id of a name that more than one player normalizes to
+AMBIGUOUS = -1
+
+
+def new_players_query(after_id: int, batch_size: int) -> Select:
+    """
+    (id, name, updated_at) of the players past `after_id`, a range on the key.
+    """
+    query = select(dbPlayer.id, dbPlayer.name, dbPlayer.updated_at)
+    query = query.where(dbPlayer.id > after_id)
+    return query.order_by(dbPlayer.id).limit(batch_size)
+
+
+def updated_players_query(
+    since: datetime, after: tuple[datetime, int] | None, batch_size: int
+) -> Select:
+    """
+    (id, name, updated_at) of the players updated at or after `since`, past
+    `after` in (updated_at, id) order, a range on idx_players_updated_at.
+    """
+    query = select(dbPlayer.id, dbPlayer.name, dbPlayer.updated_at)
+    query = query.where(dbPlayer.updated_at >= since)
+    if after is not None:
+        updated_at, id = after
+        query = query.where(
+            or_(
+                dbPlayer.updated_at > updated_at,
+                and_(dbPlayer.updated_at == updated_at, dbPlayer.id > id),
+            )
+        )
+    return query.order_by(dbPlayer.updated_at, dbPlayer.id).limit(batch_size)
+
+
+class NameIndex:
+    """
+    Normalized player name to Players.id, held in process.
+
+    Names are interned and kept sorted in a list, with the ids alongside in an
+    int array, and looked up by bisection. The same pairs are kept sorted by id
+    as well, for the current name of a player, so a rename drops the old name.
+    Players added by a refresh go to small dicts that are merged into the arrays
+    once they grow past `merge_ratio` of them.
+
+    Different names can normalize to the same one; such a name is AMBIGUOUS and
+    not answered from the index, so the lookup falls back to the database.
+    """
+
+    def __init__(self, merge_ratio: float = 0.01) -> None:
+        self.names: list[str] = []
+        self.ids = array("i")
+        self.by_id = array("i")
+        self.id_names: list[str | None] = []
+        self.delta: dict[str, int] = {}
+        self.delta_names: dict[int, str | None] = {}
+        # names dropped by a rename keep their slot, with id 0
+        self.removed = 0
+        self.merge_ratio = merge_ratio
+        self.max_id = 0
+        self.max_updated_at: datetime | None = None
+        self.loaded = False
+        self.bytes = 0
+
+        metrics.gauge("name_index_entries", fn=lambda: len(self))
+        metrics.gauge("name_index_bytes", fn=lambda: self.bytes)
+        self.load_seconds = metrics.gauge("name_index_load_seconds")
+        self.hits = metrics.counter("name_index_hits")
+        self.misses = metrics.counter("name_index_misses")
+
+    def __len__(self) -> int:
+        return len(self.names) - self.removed + len(self.delta)
+
+    def get(self, name: str) -> int | None:
+        id = self.delta.get(name)
+        if id is None:
+            i = bisect_left(self.names, name)
+            if i < len(self.names) and self.names[i] == name:
+                id = self.ids[i]
+        # removed names have id 0
+        return id if id is not None and id > 0 else None
+
+    def get_many(self, names: Iterable[str]) -> list[int] | None:
+        """
+        The ids of all the names, or None when any of them is not in the index.
+        """
+        ids = []
+        for name in names:
+            id = self.get(name)
+            if id is None:
+                self.misses.inc()
+                return None
+            ids.append(id)
+        self.hits.inc()
+        return ids
+
+    def name_of(self, id: int) -> str | None:
+        """
+        The normalized name the index has for the id.
+        """
+        if id in self.delta_names:
+            return self.delta_names[id]
+        j = bisect_left(self.by_id, id)
+        if j < len(self.by_id) and self.by_id[j] == id:
+            return self.id_names[j]
+        return None
+
+    def _track(self, id: int, updated_at: datetime | None) -> None:
+        self.max_id = max(self.max_id, id)
+        if updated_at is not None and (
+            self.max_updated_at is None or updated_at > self.max_updated_at
+        ):
+            self.max_updated_at = updated_at
+
+    def _start(self) -> list[tuple[int, str | None]]:
+        self.max_id, self.max_updated_at = 0, None
+        return []
+
+    def _append(self, players: list[tuple[int, str | None]], row: tuple) -> None:
+        id, name, updated_at = row
+        self._track(id, updated_at)
+        players.append((id, sys.intern(jagex_name(name)) if name else None))
+
+    def _finish(self, players: list[tuple[int, str | None]]) -> None:
+        players.sort()
+        self.by_id = array("i", [id for id, _ in players])
+        self.id_names = [name for _, name in players]
+        index: dict[str, int] = {}
+        for id, name in players:
+            if name is not None:
+                index[name] = AMBIGUOUS if name in index else id
+        # sort the ids along with the names
+        pairs = sorted(index.items())
+        self.names = [name for name, _ in pairs]
+        self.ids = array("i", [id for _, id in pairs])
+        self.delta, self.delta_names, self.removed = {}, {}, 0
+        self.loaded = True
+        self.bytes = self.memory_bytes()
+
+    def build(self, rows: Iterable[tuple[int, str, datetime | None]]) -> None:
+        """
+        Replace the index with (id, name, updated_at) rows.
+        """
+        players = self._start()
+        for row in rows:
+            self._append(players, row)
+        self._finish(players)
+
+    def _set_name_of(self, id: int, name: str | None) -> None:
+        j = bisect_left(self.by_id, id)
+        if j < len(self.by_id) and self.by_id[j] == id:
+            self.id_names[j] = name
+        else:
+            self.delta_names[id] = name
+
+    def _drop(self, name: str, id: int) -> None:
+        # only while the name still points at this player
+        if self.delta.get(name) == id:
+            del self.delta[name]
+            return
+        i = bisect_left(self.names, name)
+        if i < len(self.names) and self.names[i] == name and self.ids[i] == id:
+            self.ids[i] = 0
+            self.removed += 1
+
+    def _put(self, name: str, id: int) -> None:
+        # an ambiguous name stays so until the next merge counts its players again
+        i = bisect_left(self.names, name)
+        if i < len(self.names) and self.names[i] == name:
+            if self.ids[i] == 0:
+                self.removed -= 1
+                self.ids[i] = id
+            elif self.ids[i] != id:
+                self.ids[i] = AMBIGUOUS
+        elif self.delta.get(name, id) != id:
+            self.delta[name] = AMBIGUOUS
+        else:
+            self.delta[name] = id
+
+    def update(self, rows: Iterable[tuple[int, str, datetime | None]]) -> int:
+        """
+        Add or update (id, name, updated_at) rows, returns how many.
+        """
+        count = 0
+        for id, name, updated_at in rows:
+            self._track(id, updated_at)
+            name = sys.intern(jagex_name(name)) if name else None
+            old = self.name_of(id)
+            if old is not None and old != name:
+                self._drop(old, id)
+            if name is not None:
+                self._put(name, id)
+            self._set_name_of(id, name)
+            count += 1
+
+        delta = max(len(self.delta), len(self.delta_names), self.removed)
+        if delta > self.merge_ratio * len(self.by_id):
+            self._merge()
+        return count
+
+    def _merge(self) -> None:
+        # the names by id are up to date, rebuild the rest from them
+        players = list(zip(self.by_id, self.id_names))
+        players.extend(self.delta_names.items())
+        self._finish(players)
+
+    def memory_bytes(self) -> int:
+        """
+        Bytes held by the index, the strings included.
+        """
+        return (
+            sys.getsizeof(self.names)
+            + sum(map(sys.getsizeof, self.names))
+            + self.ids.buffer_info()[1] * self.ids.itemsize
+            + self.by_id.buffer_info()[1] * self.by_id.itemsize
+            + sys.getsizeof(self.id_names)
+            + sys.getsizeof(self.delta)
+            + sum(map(sys.getsizeof, self.delta))
+            + sys.getsizeof(self.delta_names)
+        )
+
+    async def _fetch_new(
+        self, session_factory: sessionmaker, after_id: int, batch_size: int
+    ):
+        """
+        Yield (id, name, updated_at) rows of the players past `after_id`.
+        """
+        while True:
+            async with session_factory() as session:
+                query = new_players_query(after_id, batch_size)
+                rows = (await session.execute(query)).all()
+            for row in rows:
+                yield tuple(row)
+            if len(rows) < batch_size:
+                return
+            after_id = rows[-1].id
+
+    async def _fetch_updated(
+        self, session_factory: sessionmaker, since: datetime, batch_size: int
+    ):
+        """
+        Yield (id, name, updated_at) rows of the players updated since `since`.
+        """
+        after = None
+        while True:
+            async with session_factory() as session:
+                query = updated_players_query(since, after, batch_size)
+                rows = (await session.execute(query)).all()
+            for row in rows:
+                yield tuple(row)
+            if len(rows) < batch_size:
+                return
+            after = (rows[-1].updated_at, rows[-1].id)
+
+    async def load(self, session_factory: sessionmaker, batch_size: int) -> None:
+        start = time.perf_counter()
+        players = self._start()
+        async for row in self._fetch_new(session_factory, 0, batch_size):
+            self._append(players, row)
+        self._finish(players)
+        self.load_seconds.set(time.perf_counter() - start)
+        logger.info(
+            {
+                "name_index_loaded": len(self),
+                "seconds": round(self.load_seconds.value, 3),
+                "bytes": self.bytes,
+            }
+        )
+
+    async def refresh(self, session_factory: sessionmaker, batch_size: int) -> int:
+        """
+        Pick up players created after the highest id, and players updated since
+        the latest updated_at, seen so far; each with a range on its own index.
+        """
+        max_id, max_updated_at = self.max_id, self.max_updated_at
+        rows = [
+            row async for row in self._fetch_new(session_factory, max_id, batch_size)
+        ]
+        if max_updated_at is not None:
+            # >= for rows committed later with the same updated_at
+            rows += [
+                row
+                async for row in self._fetch_updated(
+                    session_factory, max_updated_at, batch_size
+                )
+            ]
+        return self.update(rows)
+
+
+async def refresh_periodically(
+    index: NameIndex,
+    session_factory: sessionmaker,
+    interval: float,
+    batch_size: int,
+    shutdown_event: asyncio.Event,
+) -> None:
+    """
+    Load the index, then refresh it every `interval` seconds until shutdown.
+    """
+    while not shutdown_event.is_set():
+        try:
+            if not index.loaded:
+                await index.load(session_factory, batch_size)
+            else:
+                await index.refresh(session_factory, batch_size)
+        except Exception as e:
+            logger.error({"name_index_error": str(e)})
+        try:
+            await asyncio.wait_for(shutdown_event.wait(), timeout=interval)
+        except asyncio.TimeoutError:
+            pass
+
+
+def player_ids(player_names: Iterable[str]) -> list[int] | None:
+    """
+    Ids of the normalized names from the index, or None when the index is not
+    loaded or does not know all of them.
+    """
+    index = config.name_index
+    if index is None or not index.loaded:
+        return None
+    return index.get_many(player_names)
@@ -0,0 +1,118 @@
+import math
+import time
+from hashlib import blake2b
+from typing import Iterable
+
+from src.core import metrics
+
+
+class BloomFilter:
+    """
+    Bloom filter sized for `capacity` keys at a false positive rate of `fp_rate`.
+    """
+
+    def __init__(self, capacity: int, fp_rate: float) -> None:
+        self.capacity = capacity
+        self.size = max(8, math.ceil(-capacity * math.log(fp_rate) / math.log(2) ** 2))
+        self.hashes = max(1, round(self.size / capacity * math.log(2)))
+        self.bits = bytearray((self.size + 7) // 8)
+        self.count = 0
+
+    def _positions(self, key: str) -> list[int]:
+        # double hashing, two 64 bit halves of one digest
+        digest = blake2b(key.encode(), digest_size=16).digest()
+        h1 = int.from_bytes(digest[:8], "little")
+        h2 = int.from_bytes(digest[8:], "little") | 1
+        return [(h1 + i * h2) % self.size for i in range(self.hashes)]
+
+    def add(self, key: str) -> None:
+        for p in self._positions(key):
+            self.bits[p >> 3] |= 1 << (p & 7)
+        self.count += 1
+
+    def __contains__(self, key: str) -> bool:
+        bits = self.bits
+        return all(bits[p >> 3] & (1 << (p & 7)) for p in self._positions(key))
+
+    def fp_rate(self) -> float:
+        """
+        Expected false positive rate at the current fill.
+        """
+        return (1 - math.exp(-self.hashes * self.count / self.size)) ** self.hashes
+
+
+class NegativeCache:
+    """
+    Keys known not to exist, forgotten `ttl` seconds after they were added.
+
+    Keys go to the current of two Bloom filters, which replaces the previous one
+    every `ttl` / 2 seconds, or sooner once it holds `capacity` keys so the
+    false positive rate stays within `fp_rate` per filter. Keys that turn out to
+    exist are kept in an exception set until the filters they are in have
+    rotated out.
+    """
+
+    def __init__(
+        self, name: str, ttl: float, capacity: int, fp_rate: float = 0.001
+    ) -> None:
+        self.ttl = ttl
+        self.capacity = capacity
+        self.fp_rate = fp_rate
+        self.current = BloomFilter(capacity, fp_rate)
+        self.previous = BloomFilter(capacity, fp_rate)
+        self.rotated_at = time.monotonic()
+        self.generation = 0
+        self.exceptions: dict[str, int] = {}
+
+        self.hits = metrics.counter(f"{name}_negative_cache_hits")
+        self.misses = metrics.counter(f"{name}_negative_cache_misses")
+        self.invalidations = metrics.counter(f"{name}_negative_cache_invalidations")
+        metrics.gauge(
+            f"{name}_negative_cache_entries",
+            fn=lambda: self.current.count + self.previous.count,
+        )
+        metrics.gauge(
+            f"{name}_negative_cache_fp_rate",
+            fn=lambda: max(self.current.fp_rate(), self.previous.fp_rate()),
+        )
+
+    def _rotate(self) -> None:
+        now = time.monotonic()
+        if self.current.count < self.capacity and now - self.rotated_at < self.ttl / 2:
+            return
+        self.previous = self.current
+        self.current = BloomFilter(self.capacity, self.fp_rate)
+        self.rotated_at = now
+        self.generation += 1
+        # an exception is only needed while a filter from its time is around
+        self.exceptions = {
+            k: g for k, g in self.exceptions.items() if g >= self.generation - 1
+        }
+
+    def __contains__(self, key: str) -> bool:
+        self._rotate()
+        if key not in self.exceptions and (key in self.current or key in self.previous):
+            self.hits.inc()
+            return True
+        self.misses.inc()
+        return False
+
+    def add(self, keys: Iterable[str]) -> None:
+        for key in keys:
+            self._rotate()
+            self.exceptions.pop(key, None)
+            self.current.add(key)
+
+    def invalidate(self, keys: Iterable[str]) -> None:
+        """
+        Mark keys as existing, a Bloom filter can not drop them.
+        """
+        for key in keys:
+            if key in self.current or key in self.previous:
+                self.exceptions[key] = self.generation
+                self.invalidations.inc()
+
+    def clear(self) -> None:
+        self.current = BloomFilter(self.capacity, self.fp_rate)
+        self.previous = BloomFilter(self.capacity, self.fp_rate)
+        self.exceptions = {}
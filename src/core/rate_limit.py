@@ -0,0 +1,146 @@
+import math
+import time
+from typing import AsyncIterator, Callable
+
+from src.core import metrics
+
+
+class RateLimited(Exception):
+    def __init__(self, key: str, retry_after: int) -> None:
+        super().__init__(f"rate limited: {key}")
+        self.key = key
+        self.retry_after = retry_after
+
+
+class LocalBackend:
+    """
+    In-process token buckets, also the stand-in for a shared backend in tests.
+    """
+
+    def __init__(self, max_keys: int = 100_000) -> None:
+        self.max_keys = max_keys
+        self.buckets: dict[str, tuple[float, float]] = {}
+
+    def _prune(self, now: float, rate: float, burst: float) -> None:
+        # a bucket that refilled completely holds no state worth keeping
+        self.buckets = {
+            k: (tokens, ts)
+            for k, (tokens, ts) in self.buckets.items()
+            if tokens + (now - ts) * rate < burst
+        }
+        if len(self.buckets) > self.max_keys:
+            oldest = sorted(self.buckets.items(), key=lambda kv: kv[1][1])
+            self.buckets = dict(oldest[-self.max_keys :])
+
+    async def take(self, key: str, amount: float, rate: float, burst: float) -> bool:
+        now = time.monotonic()
+        tokens, ts = self.buckets.get(key, (burst, now))
+        tokens = min(burst, tokens + (now - ts) * rate)
+
+        allowed = tokens >= amount
+        if allowed:
+            tokens -= amount
+
+        if key not in self.buckets and len(self.buckets) >= self.max_keys:
+            self._prune(now, rate, burst)
+        self.buckets[key] = (tokens, now)
+        return allowed
+
+
+class RedisBackend:
+    """
+    Token buckets in redis, shared by all api replicas.
+    """
+
+    script = """
+    local rate, burst, amount = tonumber(ARGV[1]), tonumber(ARGV[2]), tonumber(ARGV[3])
+    local time = redis.call('TIME')
+    local now = tonumber(time[1]) + tonumber(time[2]) / 1000000
+    local state = redis.call('HMGET', KEYS[1], 'tokens', 'ts')
+    local tokens = tonumber(state[1]) or burst
+    local ts = tonumber(state[2]) or now
+    tokens = math.min(burst, tokens + math.max(0, now - ts) * rate)
+    local allowed = 0
+    if tokens >= amount then
+        tokens = tokens - amount
+        allowed = 1
+    end
+    redis.call('HSET', KEYS[1], 'tokens', tokens, 'ts', now)
+    redis.call('EXPIRE', KEYS[1], math.ceil(burst / rate) + 1)
+    return allowed
+    """
+
+    def __init__(self, url: str, prefix: str = "ratelimit:") -> None:
+        # optional dependency, only needed when a shared backend is configured
+        import redis.asyncio as redis
+
+        self.prefix = prefix
+        self.client = redis.from_url(url)
+        self._take = self.client.register_script(self.script)
+
+    async def take(self, key: str, amount: float, rate: float, burst: float) -> bool:
+        allowed = await self._take(keys=[self.prefix + key], args=[rate, burst, amount])
+        return bool(allowed)
+
+
+class RateLimiter:
+    """
+    Token bucket per key, refilled at `rate` tokens per second up to `burst`.
+    """
+
+    def __init__(
+        self,
+        rate: float,
+        burst: float,
+        backend: LocalBackend | RedisBackend | None = None,
+        chunk: int = 500,
+    ) -> None:
+        self.rate = rate
+        self.burst = burst
+        self.backend = backend or LocalBackend()
+        self.chunk = chunk
+        self.rejected = metrics.counter("report_rate_limited")
+
+    async def take(self, key: str, amount: float) -> bool:
+        return await self.backend.take(key, amount, self.rate, self.burst)
+
+    async def limit(
+        self, rows: AsyncIterator, key: Callable[..., str], max_rows: int = 0
+    ) -> AsyncIterator:
+        """
+        Pass rows through while the bucket of the first row's key has tokens.
+
+        Tokens are taken `chunk` rows at a time so a shared backend is not hit
+        for every row, what is left of the last chunk is given back at the end.
+        Raises RateLimited as soon as the bucket runs dry, after giving back all
+        the batch took; the rest of the rows, up to `max_rows`, are counted so
+        Retry-After is the time until the whole batch fits.
+        """
+        bucket, granted, count = None, 0, 0
+        try:
+            async for row in rows:
+                if bucket is None:
+                    bucket = key(row)
+                count += 1
+                if count > granted:
+                    # near the limit, fall back to taking the last tokens one by one
+                    if await self.take(bucket, self.chunk):
+                        granted += self.chunk
+                    elif await self.take(bucket, 1):
+                        granted += 1
+                    else:
+                        # the bucket held about what was granted, less than one
+                        # token is left
+                        available, granted = granted, 0
+                        await self.take(bucket, -available)
+                        async for _ in rows:
+                            if max_rows and count >= max_rows:
+                                break
+                            count += 1
+                        self.rejected.inc()
+                        retry_after = math.ceil((count - available) / self.rate)
+                        raise RateLimited(bucket, max(1, retry_after))
+                yield row
+        finally:
+            if granted > count:
+                await self.take(bucket, count - granted)
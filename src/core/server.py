@@ -1,15 +1,28 @@
 import asyncio
 import logging
 from contextlib import asynccontextmanager
+from functools import partial
 
 from fastapi import FastAPI
 from fastapi.middleware import Middleware
 from fastapi.middleware.cors import CORSMiddleware
 
 from src import api
-from src.core import config
+from src.app.repositories import report_score
+from src.app.repositories.feedback import write_feedback
+from src.app.repositories.player import watch_predictions
+from src.app.repositories.report import Report
+from src.core import config, metrics
+from src.core.admission import AdmissionQueue
+from src.core.database.database import SessionFactory, engine
+from src.core.database.pool import warm_up
+from src.core.dedupe import DedupeFilter
 from src.core.fastapi.dependencies import _kafka
 from src.core.fastapi.middleware.logging import LoggingMiddleware
+from src.core.name_index import NameIndex, refresh_periodically
+from src.core.rate_limit import LocalBackend, RateLimiter, RedisBackend
+from src.core.spool import Spool
+from src.core.write_buffer import WriteBuffer
 
 logger = logging.getLogger(__name__)
 
@@ -40,19 +53,105 @@ def make_middleware() -> list[Middleware]:
 @asynccontextmanager
 async def lifespan(app: FastAPI):
     logger.info("startup initiated")
+    # more than the pool size would be closed again as overflow
+    await warm_up(engine, min(config.settings.POOL_WARM_UP, config.settings.POOL_SIZE))
     config.producer = await _kafka.kafka_producer()
-    config.send_queue = asyncio.Queue(maxsize=500)
+    config.send_queue = AdmissionQueue(
+        maxsize=config.settings.REPORT_QUEUE_SIZE,
+        max_inflight=config.settings.REPORT_MAX_INFLIGHT,
+    )
+    if config.settings.REPORT_DEDUPE_WINDOW > 0:
+        config.report_filter = DedupeFilter(
+            key=Report.fingerprint,
+            window=config.settings.REPORT_DEDUPE_WINDOW,
+            max_entries=config.settings.REPORT_DEDUPE_MAX_ENTRIES,
+        )
+    if config.settings.REPORT_RATE_LIMIT > 0:
+        redis_url = config.settings.RATE_LIMIT_REDIS_URL
+        config.rate_limiter = RateLimiter(
+            rate=config.settings.REPORT_RATE_LIMIT,
+            burst=config.settings.REPORT_RATE_LIMIT_BURST,
+            backend=RedisBackend(redis_url) if redis_url else LocalBackend(),
+        )
+    if config.settings.REPORT_SPOOL_DIR:
+        config.spool = Spool(
+            path=config.settings.REPORT_SPOOL_DIR,
+            segment_bytes=config.settings.REPORT_SPOOL_SEGMENT_BYTES,
+            max_bytes=config.settings.REPORT_SPOOL_MAX_BYTES,
+            fsync_interval=config.settings.REPORT_SPOOL_FSYNC_INTERVAL,
+        )
+        # replays whatever a previous run left behind as well
+        asyncio.create_task(
+            _kafka.replay_spool(
+                topic="report",
+                producer=config.producer,
+                spool=config.spool,
+                shutdown_event=config.sd_event,
+                batch_size=config.settings.KAFKA_BATCH_SIZE,
+            )
+        )
+    if config.settings.PLAYER_NAME_INDEX:
+        # loads in the background, names are looked up in the database until then
+        config.name_index = NameIndex()
+        asyncio.create_task(
+            refresh_periodically(
+                index=config.name_index,
+                session_factory=SessionFactory,
+                interval=config.settings.PLAYER_NAME_INDEX_REFRESH,
+                batch_size=config.settings.PLAYER_NAME_INDEX_BATCH,
+                shutdown_event=config.sd_event,
+            )
+        )
+    prediction_cache = (
+        config.settings.PREDICTION_CACHE_TTL > 0
+        and config.settings.PREDICTION_CACHE_MAX_ENTRIES > 0
+    )
+    # the watcher is what invalidates both caches when predictions are rewritten
+    if prediction_cache or config.settings.PREDICTION_MISSING_CACHE:
+        asyncio.create_task(
+            watch_predictions(
+                session_factory=SessionFactory,
+                interval=config.settings.PREDICTION_WATCH_INTERVAL,
+                batch_size=10_000,
+                overlap=config.settings.PREDICTION_WATCH_OVERLAP,
+                shutdown_event=config.sd_event,
+            )
+        )
+    if config.settings.REPORT_SCORE_ROLLUP:
+        asyncio.create_task(report_score.refresh_periodically(config.sd_event))
+    if config.settings.FEEDBACK_BUFFER:
+        config.feedback_buffer = WriteBuffer(
+            name="feedback",
+            flush=partial(write_feedback, SessionFactory),
+            max_rows=config.settings.FEEDBACK_BUFFER_MAX_ROWS,
+            max_delay=config.settings.FEEDBACK_BUFFER_MAX_DELAY_MS / 1000,
+            max_pending=config.settings.FEEDBACK_BUFFER_MAX_PENDING,
+        )
+        feedback_flusher = asyncio.create_task(config.feedback_buffer.run())
     asyncio.create_task(
         _kafka.send_messages(
             topic="report",
             producer=config.producer,
             send_queue=config.send_queue,
             shutdown_event=config.sd_event,
+            batch_size=config.settings.KAFKA_BATCH_SIZE,
+            linger_ms=config.settings.KAFKA_LINGER_MS,
+            spool=config.spool,
         )
     )
     yield
+    await _kafka.drain(
+        send_queue=config.send_queue,
+        spool=config.spool,
+        timeout=config.settings.REPORT_SHUTDOWN_TIMEOUT,
+    )
+    if config.feedback_buffer is not None:
+        await config.feedback_buffer.drain(config.settings.REPORT_SHUTDOWN_TIMEOUT)
+        feedback_flusher.cancel()
     config.sd_event.set()
     await config.producer.stop()
+    if config.spool is not None:
+        config.spool.close()
 
 
 def create_app() -> FastAPI:
@@ -72,3 +171,8 @@ app = create_app()
 @app.get("/")
 async def root():
     return {"message": "Hello World"}
+
+
+@app.get("/metrics")
+async def get_metrics():
+    return metrics.snapshot()
@@ -0,0 +1,79 @@
+import asyncio
+from typing import Awaitable, Callable, Hashable
+
+from src.core import metrics
+
+
+class _Flight:
+    __slots__ = ("task", "waiters")
+
+    def __init__(self, task: asyncio.Task) -> None:
+        self.task = task
+        self.waiters = 0
+
+
+class SingleFlight:
+    """
+    Concurrent calls with the same key share a single call of the function.
+
+    The call runs in a task started by the first caller, later callers wait on
+    that task until it is done; the next call with the key starts a new one.
+    A caller that is cancelled does not cancel the call for the others. The
+    first caller's resources (its database session) are used by the call, so
+    when it is cancelled it still waits for the call to finish before leaving,
+    unless nobody else is waiting, then the call is cancelled as well.
+
+    With a `timeout` a caller stops waiting after that many seconds and gets
+    asyncio.TimeoutError, the call carries on for the others or is cancelled
+    when nobody else is waiting. The first caller does not wait for the call
+    then, so the function has to bring its own resources.
+    """
+
+    def __init__(self, name: str) -> None:
+        self._flights: dict[Hashable, _Flight] = {}
+        self.calls = metrics.counter(f"{name}_singleflight_calls")
+        self.collapsed = metrics.counter(f"{name}_singleflight_collapsed")
+        metrics.gauge(f"{name}_singleflight_inflight", fn=lambda: len(self._flights))
+
+    def _done(self, key: Hashable, flight: _Flight) -> None:
+        if self._flights.get(key) is flight:
+            del self._flights[key]
+
+    def _abandon(self, key: Hashable, flight: _Flight) -> None:
+        # the last caller to leave takes the call with it
+        if flight.waiters == 1:
+            self._done(key, flight)
+            flight.task.cancel()
+
+    async def do(
+        self,
+        key: Hashable,
+        fn: Callable[[], Awaitable],
+        timeout: float | None = None,
+    ):
+        self.calls.inc()
+        flight = self._flights.get(key)
+        first = flight is None
+        if first:
+            flight = self._flights[key] = _Flight(asyncio.ensure_future(fn()))
+            flight.task.add_done_callback(lambda _: self._done(key, flight))
+        else:
+            self.collapsed.inc()
+
+        flight.waiters += 1
+        try:
+            if timeout is None:
+                return await asyncio.shield(flight.task)
+            # wait() leaves the call running when the caller gives up
+            done, _ = await asyncio.wait([flight.task], timeout=timeout)
+            if not done:
+                self._abandon(key, flight)
+                raise asyncio.TimeoutError
+            return flight.task.result()
+        except asyncio.CancelledError:
+            self._abandon(key, flight)
+            if first and timeout is None:
+                await asyncio.wait([flight.task])
+            raise
+        finally:
+            flight.waiters -= 1
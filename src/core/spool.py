@@ -0,0 +1,173 @@
+import asyncio
+import json
+import logging
+import os
+import threading
+import time
+from pathlib import Path
+
+from src.core import metrics
+
+logger = logging.getLogger(__name__)
+
+
+class Spool:
+    """
+    Append-only spool of messages on local disk, split in numbered segment files.
+
+    Messages are written as json lines and fsynced at most every `fsync_interval`
+    seconds. Segments are read back oldest first; a segment is deleted once all
+    of it has been replayed, and the position inside the segment being replayed
+    is kept in a `.pos` file so a restart resumes where it left off.
+
+    The file io, the json encoding and the fsyncs run in a worker thread, one
+    call at a time, so they don't hold up the event loop.
+    """
+
+    def __init__(
+        self,
+        path: str,
+        segment_bytes: int = 16_777_216,
+        max_bytes: int = 1_073_741_824,
+        fsync_interval: float = 1.0,
+    ) -> None:
+        self.path = Path(path)
+        # fail at startup rather than on the first batch that needs the spool
+        self.path.mkdir(parents=True, exist_ok=True)
+        if not os.access(self.path, os.W_OK):
+            raise PermissionError(f"spool directory {self.path} is not writable")
+        self.segment_bytes = segment_bytes
+        self.max_bytes = max_bytes
+        self.fsync_interval = fsync_interval
+
+        self._file = None
+        self._last_fsync = 0.0
+        self._lock = threading.Lock()
+        self.size = sum(s.stat().st_size for s in self._segments())
+
+        self.spooled = metrics.counter("report_spooled_messages")
+        self.replayed = metrics.counter("report_replayed_messages")
+        metrics.gauge("report_spool_bytes", fn=lambda: self.size)
+
+    def _segments(self) -> list[Path]:
+        return sorted(self.path.glob("*.seg"))
+
+    def _roll(self) -> None:
+        self._close()
+        segments = self._segments()
+        index = int(segments[-1].stem) + 1 if segments else 0
+        self._file = open(self.path / f"{index:012d}.seg", "ab")
+
+    def is_empty(self) -> bool:
+        return not self._segments()
+
+    def _locked(self, fn, *args):
+        with self._lock:
+            return fn(*args)
+
+    async def _run(self, fn, *args):
+        return await asyncio.to_thread(self._locked, fn, *args)
+
+    async def append(self, messages: list) -> bool:
+        """
+        Write the messages to the spool, returns False when the spool is full.
+        """
+        return await self._run(self._append, messages)
+
+    async def read_batch(self, max_messages: int) -> tuple[Path, int, list] | None:
+        """
+        Read up to `max_messages` from the oldest segment.
+
+        Returns the segment, the offset to pass to `commit` once the messages
+        are delivered, and the messages; or None when the spool is empty.
+        """
+        return await self._run(self._read_batch, max_messages)
+
+    async def commit(self, segment: Path, offset: int, count: int = 0) -> None:
+        """
+        Mark everything up to `offset` in `segment` as replayed.
+        """
+        await self._run(self._commit, segment, offset, count)
+
+    def _append(self, messages: list) -> bool:
+        if self.size >= self.max_bytes:
+            logger.warning({"spool_full": self.size, "dropped": len(messages)})
+            return False
+
+        data = "".join(json.dumps(m) + "\n" for m in messages).encode()
+        if self._file is None or self._file.tell() >= self.segment_bytes:
+            self._roll()
+
+        self._file.write(data)
+        self._file.flush()
+        self.size += len(data)
+        self.spooled.inc(len(messages))
+
+        now = time.monotonic()
+        if now - self._last_fsync >= self.fsync_interval:
+            os.fsync(self._file.fileno())
+            self._last_fsync = now
+        return True
+
+    def _read_batch(self, max_messages: int) -> tuple[Path, int, list] | None:
+        segments = self._segments()
+        if not segments:
+            return None
+
+        segment = segments[0]
+        if self._file is not None and Path(self._file.name) == segment:
+            # never read the segment that is being written to
+            self._close()
+
+        pos_file = segment.with_suffix(".pos")
+        offset = int(pos_file.read_text() or 0) if pos_file.exists() else 0
+
+        messages, eof = [], False
+        with open(segment, "rb") as f:
+            f.seek(offset)
+            while len(messages) < max_messages:
+                line = f.readline()
+                if not line.endswith(b"\n"):
+                    # end of segment, or a line cut short by a crash
+                    eof = True
+                    break
+                offset += len(line)
+                try:
+                    messages.append(json.loads(line))
+                except ValueError:
+                    logger.warning({"spool_invalid_line": str(segment)})
+
+        if messages:
+            return segment, offset, messages
+
+        if not eof:
+            # only invalid lines so far, skip them
+            self._commit(segment, offset)
+            return self._read_batch(max_messages)
+
+        # fully replayed, only a cut short line can be left in a closed segment
+        self._commit(segment, segment.stat().st_size)
+        return self._read_batch(max_messages) if len(segments) > 1 else None
+
+    def _commit(self, segment: Path, offset: int, count: int = 0) -> None:
+        self.replayed.inc(count)
+        pos_file = segment.with_suffix(".pos")
+        if offset < segment.stat().st_size:
+            pos_file.write_text(str(offset))
+            return
+
+        self.size -= segment.stat().st_size
+        segment.unlink()
+        pos_file.unlink(missing_ok=True)
+
+    def close(self) -> None:
+        with self._lock:
+            self._close()
+
+    def _close(self) -> None:
+        if self._file is None:
+            return
+        self._file.flush()
+        os.fsync(self._file.fileno())
+        self._file.close()
+        self._file = None
@@ -0,0 +1,113 @@
+import asyncio
+import logging
+import time
+from typing import Any, Awaitable, Callable
+
+from src.core import metrics
+
+logger = logging.getLogger(__name__)
+
+ROW_BUCKETS = (1, 2, 5, 10, 25, 50, 100, 250, 500, 1000)
+
+
+class WriteBuffer:
+    """
+    Write-behind buffer that collects items from concurrent callers and writes
+    them together.
+
+    A flush starts once `max_rows` items are waiting, or `max_delay` seconds
+    after the first of them arrived. `flush` gets the items and returns one
+    outcome per item, which is handed back to the caller that submitted it.
+    Flushes run one at a time, so the writes hold at most one connection
+    however many callers there are.
+    """
+
+    def __init__(
+        self,
+        name: str,
+        flush: Callable[[list], Awaitable[list]],
+        max_rows: int,
+        max_delay: float,
+        max_pending: int = 0,
+    ) -> None:
+        self.name = name
+        self.flush = flush
+        self.max_rows = max_rows
+        self.max_delay = max_delay
+        self.queue: asyncio.Queue[tuple[Any, asyncio.Future | None]] = asyncio.Queue(
+            maxsize=max_pending
+        )
+
+        self.flushes = metrics.counter(f"{name}_buffer_flushes")
+        self.errors = metrics.counter(f"{name}_buffer_flush_errors")
+        self.flush_rows = metrics.histogram(f"{name}_buffer_flush_rows", ROW_BUCKETS)
+        self.flush_seconds = metrics.histogram(f"{name}_buffer_flush_seconds")
+        metrics.gauge(f"{name}_buffer_pending", fn=self.queue.qsize)
+
+    async def submit(self, item, wait: bool = True):
+        """
+        Buffer the item, waits while `max_pending` items are buffered already.
+
+        With `wait` returns the outcome of the item once its flush is done, and
+        raises what the flush raised; without it returns None right away.
+        """
+        future = asyncio.get_running_loop().create_future() if wait else None
+        await self.queue.put((item, future))
+        return await future if wait else None
+
+    async def _collect(self) -> list[tuple[Any, asyncio.Future | None]]:
+        loop = asyncio.get_running_loop()
+        batch = [await self.queue.get()]
+        deadline = loop.time() + self.max_delay
+        while len(batch) < self.max_rows:
+            if not self.queue.empty():
+                batch.append(self.queue.get_nowait())
+                continue
+            timeout = deadline - loop.time()
+            if timeout <= 0:
+                break
+            try:
+                batch.append(await asyncio.wait_for(self.queue.get(), timeout))
+            except asyncio.TimeoutError:
+                break
+        return batch
+
+    async def _flush(self, batch: list[tuple[Any, asyncio.Future | None]]) -> None:
+        start = time.perf_counter()
+        try:
+            outcomes = await self.flush([item for item, _ in batch])
+        except Exception as e:
+            self.errors.inc()
+            logger.error(
+                {f"{self.name}_buffer_flush_error": str(e), "rows": len(batch)}
+            )
+            for _, future in batch:
+                # a caller that went away cancelled its future
+                if future is not None and not future.done():
+                    future.set_exception(e)
+        else:
+            for (_, future), outcome in zip(batch, outcomes):
+                if future is not None and not future.done():
+                    future.set_result(outcome)
+        finally:
+            self.flushes.inc()
+            self.flush_rows.observe(len(batch))
+            self.flush_seconds.observe(time.perf_counter() - start)
+            for _ in batch:
+                self.queue.task_done()
+
+    async def run(self) -> None:
+        """
+        Flush until cancelled, see `drain` for stopping without losing items.
+        """
+        while True:
+            await self._flush(await self._collect())
+
+    async def drain(self, timeout: float) -> None:
+        """
+        Wait up to `timeout` seconds for the buffered items to be flushed.
+        """
+        try:
+            await asyncio.wait_for(self.queue.join(), timeout)
+        except asyncio.TimeoutError:
+            logger.warning({f"{self.name}_buffer_not_drained": self.queue.qsize()})
@@ -14,7 +14,10 @@ sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
 
 from src.core import server  # noqa: E402
-from src.core.fastapi.dependencies.session import get_session  # noqa: E402
+from src.core.fastapi.dependencies.session import (  # noqa: E402
+    get_session,
+    get_session_factory,
+)
 
 # Create an async SQLAlchemy engine
 engine = create_async_engine(
@@ -42,6 +45,7 @@ async def get_session_override():
 
 
 server.app.dependency_overrides[get_session] = get_session_override
+server.app.dependency_overrides[get_session_factory] = lambda: SessionFactory
 
 
 @pytest.fixture
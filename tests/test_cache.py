@@ -0,0 +1,126 @@
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core import cache  # noqa: E402
+from src.core.cache import TTLCache, sizeof_dict  # noqa: E402
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch) -> Clock:
+    clock = Clock()
+    monkeypatch.setattr(cache, "time", clock)
+    return clock
+
+
+def test_get_set(clock):
+    ttl_cache = TTLCache("test", ttl=60, max_entries=10)
+    hits, misses = ttl_cache.hits.value, ttl_cache.misses.value
+    assert ttl_cache.get("a") is None
+    assert ttl_cache.get("a", default=0) == 0
+
+    ttl_cache.set("a", 1)
+    assert ttl_cache.get("a") == 1
+    assert ttl_cache.hits.value - hits == 1
+    assert ttl_cache.misses.value - misses == 2
+
+
+def test_get_many(clock):
+    ttl_cache = TTLCache("test", ttl=60, max_entries=10)
+    ttl_cache.set("a", 1)
+    # a cached None is found, not missing
+    ttl_cache.set("b", None)
+    assert ttl_cache.get_many(["a", "b", "c"]) == ({"a": 1, "b": None}, ["c"])
+
+
+def test_ttl(clock):
+    ttl_cache = TTLCache("test", ttl=60, max_entries=10)
+    ttl_cache.set("a", 1)
+    clock.now += 60
+    assert ttl_cache.get("a") == 1
+
+    clock.now += 1
+    assert ttl_cache.get("a") is None
+    # an expired entry is dropped when it is read
+    assert len(ttl_cache) == 0
+    assert ttl_cache.bytes == 0
+
+
+def test_set_restarts_ttl(clock):
+    ttl_cache = TTLCache("test", ttl=60, max_entries=10)
+    ttl_cache.set("a", 1)
+    clock.now += 50
+    ttl_cache.set("a", 2)
+    clock.now += 50
+    assert ttl_cache.get("a") == 2
+
+
+def test_lru_eviction(clock):
+    ttl_cache = TTLCache("test", ttl=60, max_entries=3)
+    evictions = ttl_cache.evictions.value
+    for key in "abc":
+        ttl_cache.set(key, key)
+
+    # reading "a" makes "b" the least recently used
+    ttl_cache.get("a")
+    ttl_cache.set("d", "d")
+    assert ttl_cache.get_many("abcd") == ({"a": "a", "c": "c", "d": "d"}, ["b"])
+    assert ttl_cache.evictions.value - evictions == 1
+
+
+def test_byte_eviction(clock):
+    ttl_cache = TTLCache("test", ttl=60, max_entries=100, max_bytes=30, sizeof=len)
+    ttl_cache.set("a", "x" * 10)
+    ttl_cache.set("b", "x" * 10)
+    ttl_cache.set("c", "x" * 10)
+    assert ttl_cache.bytes == 30
+
+    # evicts from the least recently used until it fits
+    ttl_cache.set("d", "x" * 15)
+    assert len(ttl_cache) == 2
+    assert ttl_cache.get("a") is None and ttl_cache.get("b") is None
+    assert ttl_cache.bytes == 25
+
+
+def test_value_over_max_bytes(clock):
+    ttl_cache = TTLCache("test", ttl=60, max_entries=100, max_bytes=10, sizeof=len)
+    ttl_cache.set("a", "x" * 5)
+    ttl_cache.set("b", "x" * 20)
+    assert len(ttl_cache) == 0
+    assert ttl_cache.bytes == 0
+
+
+def test_replace_keeps_bytes(clock):
+    ttl_cache = TTLCache("test", ttl=60, max_entries=10, sizeof=len)
+    ttl_cache.set("a", "x" * 10)
+    ttl_cache.set("a", "x" * 4)
+    assert ttl_cache.bytes == 4
+
+
+def test_invalidate_clear(clock):
+    ttl_cache = TTLCache("test", ttl=60, max_entries=10, sizeof=len)
+    ttl_cache.set("a", "xx")
+    ttl_cache.set("b", "xxx")
+    ttl_cache.invalidate(["a", "missing"])
+    assert ttl_cache.get("a") is None
+    assert ttl_cache.bytes == 3
+
+    ttl_cache.clear()
+    assert len(ttl_cache) == 0
+    assert ttl_cache.bytes == 0
+
+
+def test_sizeof_dict():
+    row = {"name": "player", "prediction": "Real_Player"}
+    assert sizeof_dict({**row, "extra": "x" * 100}) > sizeof_dict(row) + 100
@@ -0,0 +1,98 @@
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core import dedupe  # noqa: E402
+from src.core.dedupe import DedupeFilter  # noqa: E402
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch) -> Clock:
+    clock = Clock()
+    monkeypatch.setattr(dedupe, "time", clock)
+    return clock
+
+
+def accept(dedupe_filter: DedupeFilter, items: list) -> list:
+    output, fingerprints = dedupe_filter.filter(items)
+    dedupe_filter.add(fingerprints)
+    return output
+
+
+def test_drops_duplicates(clock):
+    dedupe_filter = DedupeFilter(key=lambda x: x, window=60, max_entries=1000)
+    assert accept(dedupe_filter, [1, 2, 2, 3]) == [1, 2, 3]
+    assert accept(dedupe_filter, [3, 4]) == [4]
+    assert len(dedupe_filter) == 4
+
+
+def test_remembered_only_once_added(clock):
+    dedupe_filter = DedupeFilter(key=lambda x: x, window=60, max_entries=1000)
+    output, fingerprints = dedupe_filter.filter([1, 2])
+    assert output == [1, 2]
+    assert len(fingerprints) == 2
+
+    # the batch was rejected downstream, a retry goes through
+    assert dedupe_filter.filter([1, 2])[0] == [1, 2]
+
+
+def test_key(clock):
+    dedupe_filter = DedupeFilter(key=lambda x: x["id"], window=60, max_entries=1000)
+    assert accept(dedupe_filter, [{"id": 1, "ts": 1}, {"id": 1, "ts": 2}]) == [
+        {"id": 1, "ts": 1}
+    ]
+
+
+def test_window_rotation(clock):
+    dedupe_filter = DedupeFilter(key=lambda x: x, window=60, max_entries=1000)
+    accept(dedupe_filter, [1])
+
+    # one window later it moved to the previous generation
+    clock.now += 61
+    assert accept(dedupe_filter, [1, 2]) == [2]
+    assert dedupe_filter.previous and dedupe_filter.current
+
+    # another window and it rotated out
+    clock.now += 61
+    assert accept(dedupe_filter, [1, 2]) == [1]
+
+
+def test_idle_for_two_windows(clock):
+    dedupe_filter = DedupeFilter(key=lambda x: x, window=60, max_entries=1000)
+    accept(dedupe_filter, [1, 2])
+
+    clock.now += 121
+    assert accept(dedupe_filter, [1, 2]) == [1, 2]
+    assert not dedupe_filter.previous
+
+
+def test_rotation_at_max_entries(clock):
+    # generations of two fingerprints
+    dedupe_filter = DedupeFilter(key=lambda x: x, window=60, max_entries=4)
+    accept(dedupe_filter, [1, 2])
+    accept(dedupe_filter, [3, 4])
+    assert dedupe_filter.previous == {hash(1), hash(2)}
+
+    accept(dedupe_filter, [5])
+    assert accept(dedupe_filter, [1, 3, 5]) == [1]
+    assert len(dedupe_filter) <= 4
+
+
+def test_hit_rate(clock):
+    dedupe_filter = DedupeFilter(key=lambda x: x, window=60, max_entries=1000)
+    checked, dropped = dedupe_filter.checked.value, dedupe_filter.dropped.value
+    accept(dedupe_filter, [1, 2])
+    accept(dedupe_filter, [1, 2, 3, 4])
+    assert dedupe_filter.checked.value - checked == 6
+    assert dedupe_filter.dropped.value - dropped == 2
@@ -0,0 +1,168 @@
+import os
+import sys
+from datetime import datetime
+
+import pytest
+from sqlalchemy import text
+from sqlalchemy.dialects import mysql
+from sqlalchemy.sql.expression import CompoundSelect, Insert, Select
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.app.repositories.feedback import Feedback  # noqa: E402
+from src.app.repositories.player import (  # noqa: E402
+    Player,
+    changed_predictions,
+    prediction_cache,
+)
+from src.app.repositories.report_score import (  # noqa: E402
+    dirty_reporters_query,
+    score_query,
+)
+from src.app.views.input.feedback import FeedbackInput  # noqa: E402
+from src.core.name_index import new_players_query, updated_players_query  # noqa: E402
+from tests.conftest import SessionFactory  # noqa: E402
+
+NAMES = ["player1", "player2", "player3"]
+
+
+class ExplainSession:
+    """
+    Session wrapper that runs EXPLAIN for every select (and insert ... select) a
+    repository executes, then executes the statement itself so the repository
+    carries on as usual.
+    """
+
+    def __init__(self, session) -> None:
+        self.session = session
+        self.plans: list[tuple[str, list[dict]]] = []
+
+    async def __aenter__(self):
+        await self.session.__aenter__()
+        return self
+
+    async def __aexit__(self, *args):
+        return await self.session.__aexit__(*args)
+
+    def __getattr__(self, name):
+        return getattr(self.session, name)
+
+    async def execute(self, statement, *args, **kwargs):
+        if isinstance(statement, (Select, CompoundSelect)) or (
+            isinstance(statement, Insert) and statement.select is not None
+        ):
+            sql = str(
+                statement.compile(
+                    dialect=mysql.dialect(), compile_kwargs={"literal_binds": True}
+                )
+            )
+            result = await self.session.execute(text(f"EXPLAIN {sql}"))
+            self.plans.append((sql, [dict(row) for row in result.mappings()]))
+        return await self.session.execute(statement, *args, **kwargs)
+
+
+def assert_no_full_scan(plans: list[tuple[str, list[dict]]]):
+    assert plans, "no queries were executed"
+    for sql, plan in plans:
+        for row in plan:
+            # derived tables and materialized subqueries are scanned by design
+            if str(row["table"]).startswith("<"):
+                continue
+            assert row["type"] != "ALL", f"full scan of {row['table']} in:\n{sql}"
+
+
+async def explain(method, repository, *args):
+    async with SessionFactory() as session:
+        await session.execute(
+            text("ANALYZE TABLE Players, Predictions, Reports, PredictionsFeedback")
+        )
+        explain_session = ExplainSession(session)
+        await method(repository(explain_session), *args)
+    return explain_session.plans
+
+
+@pytest.mark.asyncio
+async def test_explain_report_score():
+    assert_no_full_scan(await explain(Player.get_report_score, Player, NAMES))
+
+
+@pytest.mark.asyncio
+async def test_explain_feedback_score():
+    assert_no_full_scan(await explain(Player.get_feedback_score, Player, NAMES))
+
+
+@pytest.mark.asyncio
+async def test_explain_prediction():
+    prediction_cache.clear()
+    assert_no_full_scan(await explain(Player.get_prediction, Player, NAMES))
+
+
+@pytest.mark.asyncio
+async def test_explain_insert_feedback():
+    feedback = FeedbackInput(
+        player_name="explain", vote=1, prediction="explain_test", subject_id=2
+    )
+    # an unknown voter, so nothing is inserted
+    assert_no_full_scan(await explain(Feedback.insert_feedback, Feedback, feedback))
+
+
+@pytest.mark.asyncio
+async def test_explain_changed_predictions():
+    async with SessionFactory() as session:
+        await session.execute(text("ANALYZE TABLE Predictions"))
+        explain_session = ExplainSession(session)
+        await changed_predictions(explain_session, datetime.now(), 100)
+    assert_no_full_scan(explain_session.plans)
+
+
+@pytest.mark.asyncio
+async def test_explain_name_index_refresh():
+    async with SessionFactory() as session:
+        await session.execute(text("ANALYZE TABLE Players"))
+        explain_session = ExplainSession(session)
+        await explain_session.execute(new_players_query(1, 100))
+        await explain_session.execute(updated_players_query(datetime.now(), None, 100))
+    assert_no_full_scan(explain_session.plans)
+
+
+@pytest.mark.asyncio
+async def test_explain_prediction_versions():
+    prediction_cache.clear()
+    assert_no_full_scan(await explain(Player.get_prediction_versions, Player, NAMES))
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("role", ["subject", "voter"])
+async def test_explain_feedback_page(role):
+    cursor = (datetime.now(), 2**31 - 1)
+    for page in (None, cursor):
+        plans = await explain(
+            Feedback.get_feedback_page, Feedback, NAMES[0], role, page, 10
+        )
+        assert_no_full_scan(plans)
+
+
+@pytest.mark.asyncio
+async def test_explain_insert_feedback_rows():
+    feedback = [
+        FeedbackInput(
+            player_name=f"explain{i}", vote=1, prediction="explain_test", subject_id=2
+        )
+        for i in range(3)
+    ]
+    # unknown voters, so nothing is inserted
+    assert_no_full_scan(
+        await explain(Feedback.insert_feedback_rows, Feedback, feedback)
+    )
+
+
+@pytest.mark.asyncio
+async def test_explain_report_score_rollup():
+    async with SessionFactory() as session:
+        await session.execute(text("ANALYZE TABLE Players, Reports"))
+        explain_session = ExplainSession(session)
+        await explain_session.execute(score_query([1, 2, 3]))
+        await explain_session.execute(
+            dirty_reporters_query(0, 100, datetime.now(), datetime.now())
+        )
+    assert_no_full_scan(explain_session.plans)
@@ -1,11 +1,14 @@
 import os
 import sys
+from types import SimpleNamespace
 
 import pytest
 from httpx import AsyncClient
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from src.app.repositories.feedback import Feedback  # noqa: E402
+
 
 @pytest.mark.asyncio
 async def test_feedback_score(custom_client):
@@ -20,3 +23,105 @@ async def test_feedback_score(custom_client):
 
         json_response: list[dict] = response.json()
         assert isinstance(json_response, list)
+
+
+@pytest.mark.asyncio
+async def test_feedback_history(custom_client):
+    endpoint = "/v2/feedback"
+
+    async with custom_client as client:
+        client: AsyncClient
+        params = {"name": "Player1", "role": "voter", "limit": 1}
+        seen, cursor = [], None
+        for _ in range(5):
+            if cursor:
+                params["cursor"] = cursor
+            response = await client.get(url=endpoint, params=params)
+            assert response.status_code == 200
+
+            json_response: dict = response.json()
+            assert len(json_response["items"]) <= 1
+            seen.extend(item["id"] for item in json_response["items"])
+            cursor = json_response["next_cursor"]
+            if cursor is None:
+                break
+        assert len(seen) == len(set(seen))
+
+        params["cursor"] = "not a cursor"
+        response = await client.get(url=endpoint, params=params)
+        assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_feedback_batch(custom_client):
+    endpoint = "/v2/feedback/batch"
+
+    async with custom_client as client:
+        client: AsyncClient
+        vote = {
+            "player_name": "Player1",
+            "vote": 1,
+            "prediction": "batch_test",
+            "subject_id": 2,
+        }
+        unknown = {**vote, "player_name": "batch unknown"}
+
+        response = await client.post(url=endpoint, json=[vote, vote, unknown])
+        assert response.status_code == 201
+
+        json_response: dict = response.json()
+        # the second vote is a duplicate of the first, on a rerun both are
+        assert json_response["inserted"] + json_response["duplicate_record"] == 2
+        assert json_response["duplicate_record"] >= 1
+        assert json_response["voter_does_not_exist"] == 1
+
+
+class KeySession:
+    """
+    Session that answers the lookup of _inserted_keys with (id, key) rows.
+    """
+
+    def __init__(self, rows: list[tuple[int, tuple]], increment: int = 1):
+        self.rows = [
+            SimpleNamespace(
+                id=id,
+                prediction=key[0],
+                subject_id=key[1],
+                voter_id=key[2],
+                increment=increment,
+            )
+            for id, key in rows
+        ]
+        self.executed = 0
+
+    async def execute(self, statement):
+        self.executed += 1
+        return SimpleNamespace(all=lambda: self.rows)
+
+
+KEYS = [("Real_Player", 2, 1), ("Real_Player", 3, 1), ("Real_Player", 4, 1)]
+
+
+@pytest.mark.asyncio
+async def test_inserted_keys_all_or_none():
+    session = KeySession([])
+    repo = Feedback(session)
+    assert await repo._inserted_keys(KEYS, 3, 3, 10) == set(KEYS)
+    assert await repo._inserted_keys(KEYS, 3, 0, 0) == set()
+    assert session.executed == 0
+
+
+@pytest.mark.asyncio
+async def test_inserted_keys_id_block():
+    # KEYS[1] was there already, the other two took ids 10 and 11
+    session = KeySession([(10, KEYS[0]), (5, KEYS[1]), (11, KEYS[2])])
+    inserted = await Feedback(session)._inserted_keys(KEYS, 3, 2, 10)
+    assert inserted == {KEYS[0], KEYS[2]}
+
+
+@pytest.mark.asyncio
+async def test_inserted_keys_increment():
+    # with auto_increment_increment = 2 the block is 10, 12, 14
+    session = KeySession([(10, KEYS[0]), (13, KEYS[1]), (14, KEYS[2])], increment=2)
+    inserted = await Feedback(session)._inserted_keys(KEYS, 3, 2, 10)
+    assert inserted == {KEYS[0], KEYS[2]}
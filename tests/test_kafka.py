@@ -0,0 +1,55 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.app.repositories.report import Report  # noqa: E402
+from src.core import config  # noqa: E402
+from src.core.fastapi.dependencies import _kafka  # noqa: E402
+
+DETECTIONS = [{"reporter": "a", "reported": f"player {i}"} for i in range(5)]
+
+
+class Producer:
+    def __init__(self) -> None:
+        self.sent = []
+
+    async def send(self, topic: str, key, value) -> asyncio.Future:
+        self.sent.append((key, value))
+        future = asyncio.get_running_loop().create_future()
+        future.set_result(None)
+        return future
+
+
+@pytest.mark.parametrize("report_format", ["detection", "envelope"])
+def test_detection_count(monkeypatch, report_format):
+    monkeypatch.setattr(config.settings, "KAFKA_REPORT_FORMAT", report_format)
+    monkeypatch.setattr(config.settings, "KAFKA_ENVELOPE_SIZE", 2)
+    messages = Report().to_messages(DETECTIONS)
+    assert _kafka.detection_count(messages) == 5
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "report_format, message_count", [("detection", 5), ("envelope", 3)]
+)
+async def test_send_counts_detections(monkeypatch, report_format, message_count):
+    monkeypatch.setattr(config.settings, "KAFKA_REPORT_FORMAT", report_format)
+    monkeypatch.setattr(config.settings, "KAFKA_ENVELOPE_SIZE", 2)
+    send_queue, shutdown_event = asyncio.Queue(), asyncio.Event()
+    for message in Report().to_messages(DETECTIONS):
+        send_queue.put_nowait(message)
+
+    messages, detections = _kafka.sent_messages.value, _kafka.sent_detections.value
+    sender = asyncio.create_task(
+        _kafka.send_messages("report", Producer(), send_queue, shutdown_event)
+    )
+    await asyncio.wait_for(send_queue.join(), timeout=1)
+    shutdown_event.set()
+    await sender
+
+    assert _kafka.sent_messages.value - messages == message_count
+    assert _kafka.sent_detections.value - detections == 5
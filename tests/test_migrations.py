@@ -0,0 +1,19 @@
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.database.migrations import MIGRATIONS_DIR, migrate  # noqa: E402
+
+
+def test_migrations_dir():
+    assert sorted(MIGRATIONS_DIR.glob("*.sql"))
+
+
+@pytest.mark.asyncio
+async def test_missing_migrations_dir(tmp_path):
+    # raises before it touches the database
+    with pytest.raises(FileNotFoundError):
+        await migrate(None, tmp_path / "missing")
@@ -0,0 +1,98 @@
+import os
+import sys
+from datetime import datetime
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.name_index import NameIndex  # noqa: E402
+
+T = datetime(2024, 1, 1)
+
+
+def index(*rows, merge_ratio: float = 1.0) -> NameIndex:
+    name_index = NameIndex(merge_ratio=merge_ratio)
+    name_index.build([(id, name, None) for id, name in rows])
+    return name_index
+
+
+def test_get():
+    name_index = index((1, "Player_One"), (2, "player two"), (3, None))
+    assert name_index.get("player one") == 1
+    assert name_index.get("player two") == 2
+    assert name_index.get("player three") is None
+    assert name_index.get_many(["player one", "player two"]) == [1, 2]
+    assert name_index.get_many(["player one", "player three"]) is None
+    assert len(name_index) == 2
+
+
+def test_colliding_names():
+    # two players whose names normalize to the same one
+    name_index = index((1, "Player_1"), (2, "player-1"), (3, "other"))
+    assert name_index.get("player 1") is None
+    assert name_index.get_many(["player 1"]) is None
+    assert name_index.get("other") == 3
+
+
+def test_collision_from_update():
+    name_index = index((1, "Player_1"), (2, "other"))
+    name_index.update([(3, "player 1", T), (4, "new", T), (5, "NEW", T)])
+    assert name_index.get("player 1") is None
+    assert name_index.get("new") is None
+
+    # the merge counts the players of a name again
+    name_index._merge()
+    assert name_index.get("player 1") is None
+    assert name_index.get("new") is None
+
+
+def test_collision_resolved_by_rename():
+    name_index = index((1, "Player_1"), (2, "player-1"))
+    name_index.update([(2, "renamed", T)])
+    assert name_index.get("renamed") == 2
+
+    name_index._merge()
+    assert name_index.get("player 1") == 1
+
+
+def test_rename_drops_old_name():
+    name_index = index((1, "before"), (2, "other"))
+    name_index.update([(1, "after", T)])
+    assert name_index.get("before") is None
+    assert name_index.get("after") == 1
+    assert name_index.name_of(1) == "after"
+    assert len(name_index) == 2
+
+    name_index._merge()
+    assert name_index.get("before") is None
+    assert name_index.get("after") == 1
+
+
+def test_rename_of_new_player():
+    name_index = index((1, "one"))
+    name_index.update([(2, "two", T)])
+    name_index.update([(2, "deux", T)])
+    assert name_index.get("two") is None
+    assert name_index.get("deux") == 2
+
+
+def test_name_taken_after_rename():
+    name_index = index((1, "name"), (2, "other"))
+    name_index.update([(1, "renamed", T), (2, "name", T)])
+    assert name_index.get("name") == 2
+    assert name_index.get("other") is None
+    assert name_index.get("renamed") == 1
+
+
+def test_update_tracks_marks():
+    name_index = index((1, "one"))
+    name_index.update([(5, "five", T), (2, None, datetime(2024, 2, 1))])
+    assert name_index.max_id == 5
+    assert name_index.max_updated_at == datetime(2024, 2, 1)
+
+
+def test_merge_at_ratio():
+    name_index = index(*[(i, f"player {i}") for i in range(1, 101)], merge_ratio=0.01)
+    name_index.update([(101, "new one", T), (102, "new two", T)])
+    assert name_index.delta == {}
+    assert name_index.get("new two") == 102
+    assert len(name_index) == 102
@@ -0,0 +1,149 @@
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core import negative_cache  # noqa: E402
+from src.core.negative_cache import BloomFilter, NegativeCache  # noqa: E402
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch) -> Clock:
+    clock = Clock()
+    monkeypatch.setattr(negative_cache, "time", clock)
+    return clock
+
+
+def test_bloom_filter_no_false_negatives():
+    bloom = BloomFilter(capacity=1000, fp_rate=0.01)
+    keys = [f"player {i}" for i in range(1000)]
+    for key in keys:
+        bloom.add(key)
+    assert all(key in bloom for key in keys)
+    assert bloom.count == 1000
+
+
+def test_bloom_filter_fp_rate():
+    bloom = BloomFilter(capacity=1000, fp_rate=0.01)
+    for i in range(1000):
+        bloom.add(f"player {i}")
+
+    false_positives = sum(f"other {i}" in bloom for i in range(10_000))
+    assert false_positives / 10_000 < 0.02
+    assert bloom.fp_rate() == pytest.approx(0.01, rel=0.2)
+
+
+def test_bloom_filter_empty():
+    bloom = BloomFilter(capacity=10, fp_rate=0.01)
+    assert "player" not in bloom
+    assert bloom.fp_rate() == 0
+
+
+def test_add_contains(clock):
+    cache = NegativeCache("test", ttl=60, capacity=100)
+    hits, misses = cache.hits.value, cache.misses.value
+    cache.add(["a", "b"])
+    assert "a" in cache and "b" in cache
+    assert "c" not in cache
+    assert cache.hits.value - hits == 2
+    assert cache.misses.value - misses == 1
+
+
+def test_forgotten_after_ttl(clock):
+    cache = NegativeCache("test", ttl=60, capacity=100)
+    cache.add(["a"])
+
+    # half a ttl later it is in the previous filter
+    clock.now += 30
+    assert "a" in cache
+    assert cache.generation == 1
+
+    clock.now += 30
+    assert "a" not in cache
+    assert cache.generation == 2
+
+
+def test_rotation_at_capacity(clock):
+    cache = NegativeCache("test", ttl=60, capacity=2)
+    cache.add(["a", "b"])
+    cache.add(["c"])
+    assert cache.generation == 1
+    cache.add(["d", "e"])
+
+    # "a" and "b" rotated out two filters ago
+    assert "a" not in cache and "b" not in cache
+    assert "c" in cache and "d" in cache and "e" in cache
+
+
+def test_invalidate(clock):
+    cache = NegativeCache("test", ttl=60, capacity=100)
+    invalidations = cache.invalidations.value
+    cache.add(["a"])
+    cache.invalidate(["a", "unknown"])
+    assert "a" not in cache
+    # only keys in a filter need an exception
+    assert cache.exceptions == {"a": 0}
+    assert cache.invalidations.value - invalidations == 1
+
+
+def test_add_after_invalidate(clock):
+    cache = NegativeCache("test", ttl=60, capacity=100)
+    cache.add(["a"])
+    cache.invalidate(["a"])
+    cache.add(["a"])
+    assert "a" in cache
+    assert cache.exceptions == {}
+
+
+def test_exceptions_pruned_across_generations(clock):
+    cache = NegativeCache("test", ttl=60, capacity=100)
+    cache.add(["a"])
+    cache.invalidate(["a"])
+
+    # the filter with "a" is the previous one, the exception still matters
+    clock.now += 30
+    assert "a" not in cache
+    assert cache.exceptions == {"a": 0}
+
+    # that filter rotated out, and the exception with it
+    clock.now += 30
+    assert "a" not in cache
+    assert cache.exceptions == {}
+
+
+def test_exception_for_previous_filter(clock):
+    cache = NegativeCache("test", ttl=60, capacity=100)
+    cache.add(["a"])
+    clock.now += 30
+    cache.add(["b"])
+
+    # "a" is only in the previous filter, invalidated in generation 1
+    cache.invalidate(["a"])
+    assert cache.exceptions == {"a": 1}
+    clock.now += 30
+    assert "a" not in cache
+    assert cache.exceptions == {"a": 1}
+
+    clock.now += 30
+    assert "a" not in cache
+    assert cache.exceptions == {}
+
+
+def test_clear(clock):
+    cache = NegativeCache("test", ttl=60, capacity=100)
+    cache.add(["a"])
+    cache.invalidate(["a"])
+    cache.add(["b"])
+    cache.clear()
+    assert "b" not in cache
+    assert cache.exceptions == {}
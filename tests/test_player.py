@@ -25,3 +25,20 @@ async def test_player_score(custom_client):
         assert "confirmed_ban" in json_response[0].keys()
         assert "confirmed_player" in json_response[0].keys()
         assert "manual_detect" in json_response[0].keys()
+
+
+@pytest.mark.asyncio
+async def test_player_combined_score(custom_client):
+    endpoint = "/v2/player/score"
+
+    async with custom_client as client:
+        client: AsyncClient
+        params = {"name": "Player1", "breakdown": True}
+        response = await client.get(url=endpoint, params=params)
+        assert response.status_code == 200
+
+        json_response: dict = response.json()
+        assert json_response["timeouts"] == []
+        assert len(json_response["report_score"]) == 3
+        assert isinstance(json_response["feedback_score"], list)
+        assert isinstance(json_response["prediction"], list)
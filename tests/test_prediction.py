@@ -1,11 +1,38 @@
+import json
 import os
 import sys
+from array import array
+from datetime import datetime
 
 import pytest
+from fastapi.responses import JSONResponse
 from httpx import AsyncClient
+from pydantic import TypeAdapter
+from sqlalchemy import select
 
 sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
 
+from src.app.views.response.prediction import (  # noqa: E402
+    BREAKDOWN_FIELDS,
+    PREDICTION_FIELDS,
+    PredictionResponse,
+    predictions_to_json,
+)
+from src.core.database.models.prediction import Prediction as dbPrediction  # noqa: E402
+from tests.conftest import SessionFactory  # noqa: E402
+
+
+@pytest.fixture
+async def predicted_name() -> str:
+    """
+    The name of a player the seed data has a prediction for.
+    """
+    query = select(dbPrediction.name).where(dbPrediction.name.is_not(None))
+    async with SessionFactory() as session:
+        name = await session.scalar(query.order_by(dbPrediction.id).limit(1))
+    assert name is not None, "no predictions in the seed data"
+    return name
+
 
 @pytest.mark.asyncio
 async def test_prediction(custom_client):
@@ -18,3 +45,72 @@ async def test_prediction(custom_client):
         json_response: list[dict] = response.json()
 
         assert isinstance(json_response, list)
+
+
+@pytest.mark.asyncio
+async def test_prediction_bulk(custom_client):
+    endpoint = "/v2/player/prediction/bulk"
+
+    async with custom_client as client:
+        client: AsyncClient
+        names = ["Player1", "player_1", "Player2"] + [f"unknown{i}" for i in range(600)]
+        response = await client.post(
+            url=endpoint, params={"breakdown": False}, json=names
+        )
+        assert response.status_code == 200
+        assert response.headers["content-type"] == "application/x-ndjson"
+
+        rows = [json.loads(line) for line in response.text.splitlines()]
+        assert all(row["predictions_breakdown"] == {} for row in rows)
+        assert len({row["player_name"] for row in rows}) == len(rows)
+
+
+def test_prediction_json_matches_response_model():
+    row = {
+        "id": 1,
+        "name": "Player1",
+        "prediction": "Real_Player",
+        "predicted_confidence": 87.5,
+        "created": datetime(2024, 1, 1, 12, 30, 15),
+        "real_player": 87.5,
+        "smithing_bot": 0.01,
+        "magic_bot": 0.0,
+    }
+    adapter = TypeAdapter(list[PredictionResponse])
+    for breakdown in (True, False):
+        models = [PredictionResponse.from_data(row, breakdown)]
+        expected = JSONResponse(adapter.dump_python(models, mode="json")).body
+        assert predictions_to_json([row], breakdown) == expected
+
+
+def test_prediction_json_packed_breakdown():
+    row = {
+        "id": 1,
+        "name": "Player1",
+        "prediction": "Real_Player",
+        "predicted_confidence": 87.5,
+        "created": datetime(2024, 1, 1, 12, 30, 15),
+        **{field: 0.0 for field in BREAKDOWN_FIELDS},
+        "real_player": 87.5,
+    }
+    packed = {k: row[k] for k in PREDICTION_FIELDS}
+    packed["breakdown"] = array("d", [row[field] for field in BREAKDOWN_FIELDS])
+    assert predictions_to_json([packed], True) == predictions_to_json([row], True)
+
+
+@pytest.mark.asyncio
+async def test_prediction_not_modified(custom_client, predicted_name):
+    endpoint = "/v2/player/prediction"
+
+    async with custom_client as client:
+        client: AsyncClient
+        params = {"name": predicted_name, "breakdown": True}
+        response = await client.get(url=endpoint, params=params)
+        assert response.status_code == 200
+        assert "last-modified" in response.headers
+        assert "cache-control" in response.headers
+
+        headers = {"If-None-Match": response.headers["etag"]}
+        response = await client.get(url=endpoint, params=params, headers=headers)
+        assert response.status_code == 304
+        assert response.content == b""
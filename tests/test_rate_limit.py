@@ -0,0 +1,167 @@
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core import rate_limit  # noqa: E402
+from src.core.rate_limit import LocalBackend, RateLimited, RateLimiter  # noqa: E402
+
+
+class Clock:
+    def __init__(self) -> None:
+        self.now = 1000.0
+
+    def monotonic(self) -> float:
+        return self.now
+
+
+@pytest.fixture
+def clock(monkeypatch) -> Clock:
+    clock = Clock()
+    monkeypatch.setattr(rate_limit, "time", clock)
+    return clock
+
+
+async def rows(count: int, key: str = "a"):
+    for i in range(count):
+        yield {"key": key, "i": i}
+
+
+def tokens(limiter: RateLimiter, key: str = "a") -> float:
+    return limiter.backend.buckets[key][0]
+
+
+@pytest.mark.asyncio
+async def test_bucket_refill(clock):
+    backend = LocalBackend()
+    assert await backend.take("a", 10, rate=1, burst=10)
+    assert not await backend.take("a", 1, rate=1, burst=10)
+
+    clock.now += 5
+    assert await backend.take("a", 5, rate=1, burst=10)
+    assert not await backend.take("a", 1, rate=1, burst=10)
+
+    # refills up to the burst, not past it
+    clock.now += 100
+    assert not await backend.take("a", 11, rate=1, burst=10)
+    assert await backend.take("a", 10, rate=1, burst=10)
+
+
+@pytest.mark.asyncio
+async def test_buckets_per_key(clock):
+    backend = LocalBackend()
+    assert await backend.take("a", 10, rate=1, burst=10)
+    assert await backend.take("b", 10, rate=1, burst=10)
+    assert not await backend.take("a", 1, rate=1, burst=10)
+
+
+@pytest.mark.asyncio
+async def test_prune_at_max_keys(clock):
+    backend = LocalBackend(max_keys=2)
+    await backend.take("full", 0, rate=1, burst=10)
+    await backend.take("a", 5, rate=1, burst=10)
+    clock.now += 1
+    await backend.take("b", 5, rate=1, burst=10)
+
+    # the full bucket goes first, then the oldest
+    await backend.take("c", 5, rate=1, burst=10)
+    assert set(backend.buckets) == {"a", "b", "c"}
+    clock.now += 1
+    await backend.take("d", 5, rate=1, burst=10)
+    assert set(backend.buckets) == {"b", "c", "d"}
+
+
+@pytest.mark.asyncio
+async def test_limit_passes_rows(clock):
+    limiter = RateLimiter(rate=1, burst=1000, chunk=100)
+    output = [row async for row in limiter.limit(rows(250), key=lambda r: r["key"])]
+    assert len(output) == 250
+    # three chunks taken, what the last one did not use given back
+    assert tokens(limiter) == 750
+
+
+@pytest.mark.asyncio
+async def test_limit_rejects(clock):
+    limiter = RateLimiter(rate=10, burst=3, chunk=100)
+    rejected = limiter.rejected.value
+    output = []
+    with pytest.raises(RateLimited) as e:
+        async for row in limiter.limit(rows(5), key=lambda r: r["key"]):
+            output.append(row)
+
+    # the chunk did not fit, the last tokens were taken one by one
+    assert len(output) == 3
+    assert e.value.key == "a"
+    # 5 rows, 3 tokens: 2 missing at 10 per second
+    assert e.value.retry_after == 1
+    assert limiter.rejected.value == rejected + 1
+    # the tokens the rejected batch took are given back
+    assert tokens(limiter) == 3
+
+
+@pytest.mark.asyncio
+async def test_limit_refund_when_consumer_stops(clock):
+    limiter = RateLimiter(rate=1, burst=1000, chunk=100)
+    stream = limiter.limit(rows(250), key=lambda r: r["key"])
+    async for row in stream:
+        if row["i"] == 9:
+            break
+    await stream.aclose()
+    assert tokens(limiter) == 990
+
+
+@pytest.mark.asyncio
+async def test_limit_refund_on_error(clock):
+    async def failing():
+        async for row in rows(10):
+            yield row
+        raise ValueError("bad row")
+
+    limiter = RateLimiter(rate=1, burst=1000, chunk=100)
+    with pytest.raises(ValueError):
+        async for _ in limiter.limit(failing(), key=lambda r: r["key"]):
+            pass
+    assert tokens(limiter) == 990
+
+
+@pytest.mark.asyncio
+async def test_limit_no_rows(clock):
+    limiter = RateLimiter(rate=1, burst=1000, chunk=100)
+    assert [row async for row in limiter.limit(rows(0), key=lambda r: r["key"])] == []
+    assert limiter.backend.buckets == {}
+
+
+async def limited(limiter: RateLimiter, count: int) -> list:
+    return [row async for row in limiter.limit(rows(count), key=lambda r: r["key"])]
+
+
+@pytest.mark.asyncio
+async def test_rejected_batch_leaves_bucket_unchanged(clock):
+    limiter = RateLimiter(rate=100, burst=10_000, chunk=500)
+    assert len(await limited(limiter, 5000)) == 5000
+    assert len(await limited(limiter, 4800)) == 4800
+    assert tokens(limiter) == 200
+
+    with pytest.raises(RateLimited) as e:
+        await limited(limiter, 5000)
+    assert tokens(limiter) == 200
+    # the whole batch is counted, 4800 tokens missing at 100 per second
+    assert e.value.retry_after == 48
+
+    clock.now += e.value.retry_after
+    assert len(await limited(limiter, 5000)) == 5000
+
+
+@pytest.mark.asyncio
+async def test_retry_after_counts_up_to_max_rows(clock):
+    limiter = RateLimiter(rate=10, burst=10, chunk=100)
+    await limited(limiter, 10)
+
+    stream = limiter.limit(rows(1000), key=lambda r: r["key"], max_rows=100)
+    with pytest.raises(RateLimited) as e:
+        async for _ in stream:
+            pass
+    assert e.value.retry_after == 10
+    assert tokens(limiter) == 0
@@ -1,8 +1,10 @@
+import json
 import os
 import sys
 import time
 from typing import Optional
 
+import msgpack
 import pytest
 from httpx import AsyncClient
 from pydantic import BaseModel
@@ -83,3 +85,80 @@ async def test_invalid_ts_low_report(custom_client):
         client: AsyncClient
         response = await client.post(endpoint, json=detection_data)
         assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_valid_ndjson_report(custom_client):
+    global example_data
+    endpoint = "/v2/report"
+    _data = example_data.copy()
+    _data["ts"] = int(time.time())
+
+    # one detection per line
+    content = "\n".join(json.dumps(d) for d in [_data, _data])
+    headers = {"content-type": "application/x-ndjson"}
+
+    async with custom_client as client:
+        client: AsyncClient
+        response = await client.post(endpoint, content=content, headers=headers)
+        assert response.status_code == 201
+
+
+@pytest.mark.asyncio
+async def test_invalid_unique_reporter_report(custom_client):
+    global example_data
+    endpoint = "/v2/report"
+    _data = example_data.copy()
+    _data["ts"] = int(time.time())
+    _other = _data.copy()
+    _other["reporter"] = "player3"
+
+    detection_data = [_data, _other]
+
+    async with custom_client as client:
+        client: AsyncClient
+        response = await client.post(endpoint, json=detection_data)
+        assert response.status_code == 400
+
+
+@pytest.mark.asyncio
+async def test_valid_msgpack_report(custom_client):
+    global example_data
+    endpoint = "/v2/report"
+    _data = {**example_data, **example_data["equipment"]}
+    _data["ts"] = int(time.time())
+
+    # one array per detection, equipment flattened into the row
+    fields = [k for k in example_data if k not in ("equipment", "equip_ge_value")]
+    fields += ["equip_ge_value", *example_data["equipment"]]
+    content = msgpack.packb([_data[f] for f in fields])
+    headers = {"content-type": "application/msgpack"}
+
+    async with custom_client as client:
+        client: AsyncClient
+        response = await client.post(endpoint, content=content, headers=headers)
+        assert response.status_code == 201
+
+
+@pytest.mark.asyncio
+async def test_valid_large_msgpack_report(custom_client):
+    global example_data
+    endpoint = "/v2/report"
+    _data = {**example_data, **example_data["equipment"]}
+    _data["ts"] = int(time.time())
+
+    fields = [k for k in example_data if k not in ("equipment", "equip_ge_value")]
+    fields += ["equip_ge_value", *example_data["equipment"]]
+    # a body far larger than one msgpack item, sent as a single chunk
+    rows = [
+        [f"player{i}" if f == "reported" else _data[f] for f in fields]
+        for i in range(3000)
+    ]
+    content = b"".join(msgpack.packb(row) for row in rows)
+    assert len(content) > 131_072
+    headers = {"content-type": "application/msgpack"}
+
+    async with custom_client as client:
+        client: AsyncClient
+        response = await client.post(endpoint, content=content, headers=headers)
+        assert response.status_code == 201
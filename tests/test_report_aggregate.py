@@ -0,0 +1,150 @@
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.app.repositories.report import Report  # noqa: E402
+from src.app.views.input.report import (  # noqa: E402
+    AggregatedDetection,
+    Detection,
+    Equipment,
+)
+from src.core import config, metrics  # noqa: E402
+
+TS = 1_700_000_000
+
+
+@pytest.fixture(autouse=True)
+def settings(monkeypatch):
+    monkeypatch.setattr(config.settings, "REPORT_AGGREGATE", True)
+    monkeypatch.setattr(config.settings, "REPORT_AGGREGATE_MAX_DISTANCE", 2)
+    monkeypatch.setattr(config.settings, "REPORT_AGGREGATE_MAX_GAP", 60)
+    monkeypatch.setattr(config.settings, "REPORT_AGGREGATE_MATCH_EQUIPMENT", True)
+    return config.settings
+
+
+def detection(**values) -> Detection:
+    fields = {
+        "reporter": "reporter",
+        "reported": "reported",
+        "region_id": 12598,
+        "x_coord": 3200,
+        "y_coord": 3200,
+        "z_coord": 0,
+        "ts": TS,
+        "world_number": 330,
+        "equipment": Equipment(equip_head_id=1),
+        "equip_ge_value": 100,
+    }
+    return Detection(**{**fields, **values})
+
+
+def test_disabled(settings):
+    settings.REPORT_AGGREGATE = False
+    data = [detection(), detection(ts=TS + 1)]
+    assert Report().aggregate(data) is data
+
+
+def test_collapse_run():
+    data = [detection(ts=TS), detection(ts=TS + 30), detection(ts=TS + 60)]
+    [output] = Report().aggregate(data)
+    assert isinstance(output, AggregatedDetection)
+    assert output.count == 3
+    assert output.ts == output.first_ts == TS
+    assert output.last_ts == TS + 60
+    assert output.reported == "reported"
+
+
+def test_single_sighting_as_is():
+    data = [detection()]
+    assert Report().aggregate(data) == data
+    assert type(Report().aggregate(data)[0]) is Detection
+
+
+def test_gap():
+    data = [detection(ts=TS), detection(ts=TS + 61)]
+    assert Report().aggregate(data) == data
+
+
+def test_gap_from_previous_sighting():
+    # each within the gap of the one before, the run spans more than the gap
+    data = [detection(ts=TS + i * 50) for i in range(4)]
+    [output] = Report().aggregate(data)
+    assert output.count == 4
+    assert output.last_ts == TS + 150
+
+
+def test_distance_from_run_start():
+    data = [detection(x_coord=3200 + i) for i in (0, 2, 4)]
+    output = Report().aggregate(data)
+    assert [getattr(d, "count", 1) for d in output] == [2, 1]
+    assert output[1].x_coord == 3204
+
+
+@pytest.mark.parametrize(
+    "values",
+    [
+        {"region_id": 12599},
+        {"z_coord": 1},
+        {"y_coord": 3203},
+        {"world_number": 331},
+        {"manual_detect": 1},
+        {"on_members_world": 1},
+        {"on_pvp_world": 1},
+        {"equipment": Equipment(equip_head_id=2)},
+        {"equip_ge_value": 200},
+    ],
+)
+def test_not_same_sighting(values):
+    data = [detection(), detection(ts=TS + 1, **values)]
+    assert Report().aggregate(data) == data
+
+
+def test_equipment_ignored(settings):
+    settings.REPORT_AGGREGATE_MATCH_EQUIPMENT = False
+    data = [detection(), detection(ts=TS + 1, equipment=Equipment(equip_head_id=2))]
+    [output] = Report().aggregate(data)
+    assert output.count == 2
+    # the first sighting's equipment is kept
+    assert output.equipment.equip_head_id == 1
+
+
+def test_runs_per_player():
+    data = [
+        detection(reported="a", ts=TS),
+        detection(reported="b", ts=TS),
+        detection(reported="a", ts=TS + 10),
+    ]
+    output = Report().aggregate(data)
+    assert [(d.reported, getattr(d, "count", 1)) for d in output] == [
+        ("a", 2),
+        ("b", 1),
+    ]
+
+
+def test_new_run_replaces_open_run():
+    data = [detection(ts=TS), detection(ts=TS + 100), detection(ts=TS + 110)]
+    output = Report().aggregate(data)
+    assert output[0] is data[0]
+    assert (output[1].count, output[1].first_ts, output[1].last_ts) == (
+        2,
+        TS + 100,
+        TS + 110,
+    )
+
+
+def test_out_of_order():
+    data = [detection(ts=TS + 30), detection(ts=TS), detection(ts=TS + 20)]
+    [output] = Report().aggregate(data)
+    assert (output.ts, output.first_ts, output.last_ts) == (TS, TS, TS + 30)
+
+
+def test_counters():
+    rows_in = metrics.counter("report_aggregate_in")
+    rows_out = metrics.counter("report_aggregate_out")
+    before = rows_in.value, rows_out.value
+    Report().aggregate([detection(), detection(ts=TS + 1), detection(ts=TS + 100)])
+    assert rows_in.value - before[0] == 3
+    assert rows_out.value - before[1] == 2
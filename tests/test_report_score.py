@@ -0,0 +1,28 @@
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.app.repositories.player import Player  # noqa: E402
+from src.app.repositories.report_score import ReportScore  # noqa: E402
+from tests.conftest import SessionFactory  # noqa: E402
+
+
+@pytest.mark.asyncio
+async def test_report_score_rollup():
+    async with SessionFactory() as session:
+        repo = ReportScore(session)
+        assert await repo.rebuild() is not None
+        # reporters in the look back window are recomputed again
+        assert await repo.refresh() is not None
+        assert await repo.check() == []
+
+        rollup = await repo.get_score("player1")
+        live = await Player(session).get_report_score(["player1"])
+
+    def key(row):
+        return row["possible_ban"], row["confirmed_ban"], row["confirmed_player"]
+
+    assert sorted(map(dict, rollup), key=key) == sorted(map(dict, live), key=key)
@@ -0,0 +1,179 @@
+import asyncio
+import os
+import sys
+import time
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.singleflight import SingleFlight  # noqa: E402
+
+
+class Call:
+    """
+    A function for SingleFlight.do that counts its calls and can be held open.
+    """
+
+    def __init__(self, result="result") -> None:
+        self.result = result
+        self.calls = 0
+        self.cancelled = False
+        self.release = asyncio.Event()
+
+    async def __call__(self):
+        self.calls += 1
+        try:
+            await self.release.wait()
+        except asyncio.CancelledError:
+            self.cancelled = True
+            raise
+        return self.result
+
+
+@pytest.mark.asyncio
+async def test_timeout_on_shared_call():
+    flight, call = SingleFlight("test_timeout_shared"), Call()
+    other = asyncio.ensure_future(flight.do("key", call))
+    await asyncio.sleep(0)
+
+    start = time.perf_counter()
+    with pytest.raises(asyncio.TimeoutError):
+        await flight.do("key", call, timeout=0.05)
+    assert time.perf_counter() - start < 0.5
+
+    # the shared call carries on for the other caller
+    assert not call.cancelled
+    call.release.set()
+    assert await other == "result"
+    assert call.calls == 1
+
+
+@pytest.mark.asyncio
+async def test_timeout_of_first_caller_alone_cancels_call():
+    flight, call = SingleFlight("test_timeout_alone"), Call()
+
+    with pytest.raises(asyncio.TimeoutError):
+        await flight.do("key", call, timeout=0.05)
+    await asyncio.sleep(0)
+    assert call.cancelled
+
+    # the next call starts a new flight
+    call.release.set()
+    assert await flight.do("key", call, timeout=1) == "result"
+    assert call.calls == 2
+
+
+@pytest.mark.asyncio
+async def test_timeout_of_first_caller_leaves_call_to_others():
+    flight, call = SingleFlight("test_timeout_first"), Call()
+    first = asyncio.ensure_future(flight.do("key", call, timeout=0.05))
+    await asyncio.sleep(0)
+    other = asyncio.ensure_future(flight.do("key", call))
+
+    with pytest.raises(asyncio.TimeoutError):
+        await first
+    assert not call.cancelled
+    call.release.set()
+    assert await other == "result"
+
+
+@pytest.mark.asyncio
+async def test_concurrent_calls_share_one_call():
+    flight, call = SingleFlight("test_share"), Call()
+    tasks = [asyncio.ensure_future(flight.do("key", call)) for _ in range(5)]
+    await asyncio.sleep(0)
+    call.release.set()
+
+    assert await asyncio.gather(*tasks) == ["result"] * 5
+    assert call.calls == 1
+    assert flight.calls.value == 5
+    assert flight.collapsed.value == 4
+
+
+@pytest.mark.asyncio
+async def test_different_keys_do_not_share():
+    flight, call = SingleFlight("test_keys"), Call()
+    call.release.set()
+
+    await asyncio.gather(flight.do("a", call), flight.do("b", call))
+    assert call.calls == 2
+    assert flight.collapsed.value == 0
+
+
+@pytest.mark.asyncio
+async def test_new_flight_after_completion():
+    flight, call = SingleFlight("test_completed"), Call()
+    call.release.set()
+
+    assert await flight.do("key", call) == "result"
+    assert await flight.do("key", call) == "result"
+    assert call.calls == 2
+    assert not flight._flights
+
+
+@pytest.mark.asyncio
+async def test_exception_reaches_every_caller():
+    flight = SingleFlight("test_exception")
+    release = asyncio.Event()
+
+    async def fail():
+        await release.wait()
+        raise ValueError("failed")
+
+    tasks = [asyncio.ensure_future(flight.do("key", fail)) for _ in range(3)]
+    await asyncio.sleep(0)
+    release.set()
+    results = await asyncio.gather(*tasks, return_exceptions=True)
+    assert all(isinstance(r, ValueError) for r in results)
+    assert not flight._flights
+
+
+@pytest.mark.asyncio
+async def test_first_caller_cancelled_alone_cancels_call():
+    flight, call = SingleFlight("test_cancel_alone"), Call()
+    first = asyncio.ensure_future(flight.do("key", call))
+    await asyncio.sleep(0)
+
+    first.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await first
+    assert call.cancelled
+    assert not flight._flights
+
+
+@pytest.mark.asyncio
+async def test_first_caller_cancelled_waits_for_others():
+    flight, call = SingleFlight("test_cancel_first"), Call()
+    first = asyncio.ensure_future(flight.do("key", call))
+    await asyncio.sleep(0)
+    other = asyncio.ensure_future(flight.do("key", call))
+    await asyncio.sleep(0)
+
+    first.cancel()
+    await asyncio.sleep(0.01)
+    # the call uses the first caller's resources, so it stays until the call is done
+    assert not first.done()
+    assert not call.cancelled
+
+    call.release.set()
+    assert await other == "result"
+    with pytest.raises(asyncio.CancelledError):
+        await first
+
+
+@pytest.mark.asyncio
+async def test_other_caller_cancelled_leaves_call_running():
+    flight, call = SingleFlight("test_cancel_other"), Call()
+    first = asyncio.ensure_future(flight.do("key", call))
+    await asyncio.sleep(0)
+    other = asyncio.ensure_future(flight.do("key", call))
+    await asyncio.sleep(0)
+
+    other.cancel()
+    with pytest.raises(asyncio.CancelledError):
+        await other
+    assert not call.cancelled
+
+    call.release.set()
+    assert await first == "result"
@@ -0,0 +1,126 @@
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.spool import Spool  # noqa: E402
+
+
+def messages(start: int, count: int) -> list[dict]:
+    return [{"id": i} for i in range(start, start + count)]
+
+
+@pytest.mark.asyncio
+async def test_append_read_commit(tmp_path):
+    spool = Spool(str(tmp_path))
+    assert await spool.append(messages(0, 5))
+    assert spool.size > 0
+
+    segment, offset, batch = await spool.read_batch(max_messages=10)
+    assert batch == messages(0, 5)
+
+    await spool.commit(segment, offset, count=len(batch))
+    assert not segment.exists()
+    assert spool.is_empty()
+    assert spool.size == 0
+    assert await spool.read_batch(max_messages=10) is None
+
+
+@pytest.mark.asyncio
+async def test_read_in_batches(tmp_path):
+    spool = Spool(str(tmp_path))
+    await spool.append(messages(0, 5))
+
+    segment, offset, batch = await spool.read_batch(max_messages=3)
+    assert batch == messages(0, 3)
+    # not committed, the same messages again
+    assert (await spool.read_batch(max_messages=3))[2] == messages(0, 3)
+
+    await spool.commit(segment, offset, count=len(batch))
+    assert segment.with_suffix(".pos").exists()
+    segment, offset, batch = await spool.read_batch(max_messages=3)
+    assert batch == messages(3, 2)
+
+
+@pytest.mark.asyncio
+async def test_segments_oldest_first(tmp_path):
+    spool = Spool(str(tmp_path), segment_bytes=1)
+    for start in range(0, 9, 3):
+        await spool.append(messages(start, 3))
+    assert len(list(tmp_path.glob("*.seg"))) == 3
+
+    replayed = []
+    while (batch := await spool.read_batch(max_messages=100)) is not None:
+        segment, offset, batch = batch
+        replayed += batch
+        await spool.commit(segment, offset, count=len(batch))
+    assert replayed == messages(0, 9)
+    assert spool.is_empty()
+
+
+@pytest.mark.asyncio
+async def test_full(tmp_path):
+    spool = Spool(str(tmp_path), max_bytes=1)
+    assert await spool.append(messages(0, 1))
+    assert not await spool.append(messages(1, 1))
+
+    _, _, batch = await spool.read_batch(max_messages=10)
+    assert batch == messages(0, 1)
+
+
+@pytest.mark.asyncio
+async def test_restart_resumes(tmp_path):
+    spool = Spool(str(tmp_path))
+    await spool.append(messages(0, 5))
+    segment, offset, batch = await spool.read_batch(max_messages=2)
+    await spool.commit(segment, offset, count=len(batch))
+    spool.close()
+
+    restarted = Spool(str(tmp_path))
+    assert restarted.size == spool.size
+    _, _, batch = await restarted.read_batch(max_messages=10)
+    assert batch == messages(2, 3)
+
+
+@pytest.mark.asyncio
+async def test_line_cut_short(tmp_path):
+    spool = Spool(str(tmp_path))
+    await spool.append(messages(0, 2))
+    spool.close()
+    segment = next(tmp_path.glob("*.seg"))
+    with open(segment, "ab") as f:
+        f.write(b'{"id": 2')
+
+    restarted = Spool(str(tmp_path))
+    segment, offset, batch = await restarted.read_batch(max_messages=10)
+    assert batch == messages(0, 2)
+
+    # the cut short line is dropped along with the replayed segment
+    await restarted.commit(segment, offset, count=len(batch))
+    assert await restarted.read_batch(max_messages=10) is None
+    assert restarted.is_empty()
+    assert restarted.size == 0
+
+
+@pytest.mark.asyncio
+async def test_invalid_line_skipped(tmp_path):
+    spool = Spool(str(tmp_path))
+    await spool.append(messages(0, 1))
+    spool.close()
+    segment = next(tmp_path.glob("*.seg"))
+    with open(segment, "ab") as f:
+        f.write(b"not json\n")
+    await spool.append(messages(1, 1))
+
+    _, _, batch = await spool.read_batch(max_messages=10)
+    assert batch == messages(0, 1)
+
+
+def test_directory_not_usable(tmp_path):
+    # a file where the directory should be
+    path = tmp_path / "spool"
+    path.write_text("")
+    with pytest.raises(OSError):
+        Spool(str(path))
@@ -0,0 +1,162 @@
+import json
+import os
+import sys
+
+import msgpack
+import pytest
+from fastapi.exceptions import RequestValidationError
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.fastapi.dependencies.stream import (  # noqa: E402
+    iter_json_array,
+    iter_msgpack,
+    iter_ndjson,
+)
+
+
+async def _chunks(*chunks: bytes):
+    for chunk in chunks:
+        yield chunk
+
+
+async def _collect(items) -> list:
+    return [item async for item in items]
+
+
+def _split(body: bytes, size: int) -> list[bytes]:
+    return [body[i : i + size] for i in range(0, len(body), size)]
+
+
+ITEMS = [{"reporter": "player1", "ts": i, "name": "pläyer"} for i in range(20)] + [
+    12345,
+    "text",
+    None,
+]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("size", [1, 3, 7, 64, 10_000])
+async def test_json_array_split_over_chunks(size):
+    body = json.dumps(ITEMS).encode()
+    assert await _collect(iter_json_array(_chunks(*_split(body, size)))) == ITEMS
+
+
+@pytest.mark.asyncio
+async def test_json_array_number_at_chunk_end():
+    assert await _collect(iter_json_array(_chunks(b"[12", b"34, 5", b"6]"))) == [
+        1234,
+        56,
+    ]
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "body, items",
+    [
+        (b"[]", []),
+        (b"  [ ]  ", []),
+        (b'\n[\n\t{"a": 1} ,\r\n {"a": 2}\n]\n', [{"a": 1}, {"a": 2}]),
+    ],
+)
+async def test_json_array_whitespace(body, items):
+    assert await _collect(iter_json_array(_chunks(body))) == items
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize(
+    "body",
+    [
+        b'[{"a": 1},]',
+        b'[{"a": 1}, ]',
+        b'[{"a": 1},,{"a": 2}]',
+        b'[,{"a": 1}]',
+        b"[,]",
+        b'[{"a": 1} {"a": 2}]',
+        b'{"a": 1}',
+        b'[{"a": 1}] []',
+        b"",
+    ],
+)
+async def test_json_array_invalid(body):
+    with pytest.raises(RequestValidationError):
+        await _collect(iter_json_array(_chunks(*_split(body, 3) or [b""])))
+
+
+@pytest.mark.asyncio
+async def test_json_array_item_too_large():
+    body = json.dumps([{"a": "x" * 1000}]).encode()
+    with pytest.raises(RequestValidationError):
+        await _collect(iter_json_array(_chunks(*_split(body, 64)), max_item_size=100))
+
+
+@pytest.mark.asyncio
+async def test_json_array_truncated():
+    body = json.dumps(ITEMS).encode()[:-5]
+    with pytest.raises(RequestValidationError):
+        await _collect(iter_json_array(_chunks(*_split(body, 16))))
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("size", [1, 5, 64, 10_000])
+async def test_ndjson_split_over_chunks(size):
+    body = "\n".join(json.dumps(item) for item in ITEMS).encode()
+    assert await _collect(iter_ndjson(_chunks(*_split(body, size)))) == ITEMS
+
+
+@pytest.mark.asyncio
+async def test_ndjson_blank_lines():
+    body = b'\n{"a": 1}\n\n  \n{"a": 2}\r\n\n'
+    assert await _collect(iter_ndjson(_chunks(body))) == [{"a": 1}, {"a": 2}]
+    assert await _collect(iter_ndjson(_chunks(b"\n \n"))) == []
+
+
+@pytest.mark.asyncio
+async def test_ndjson_line_too_large():
+    body = json.dumps({"a": "x" * 1000}).encode() + b"\n"
+    with pytest.raises(RequestValidationError):
+        await _collect(iter_ndjson(_chunks(*_split(body, 64)), max_item_size=100))
+
+
+@pytest.mark.asyncio
+@pytest.mark.parametrize("body", [b'{"a": 1}\n{"a": ', b'{"a": 1}\nnot json\n'])
+async def test_ndjson_invalid(body):
+    with pytest.raises(RequestValidationError):
+        await _collect(iter_ndjson(_chunks(body)))
+
+
+@pytest.mark.asyncio
+async def test_msgpack_chunk_larger_than_buffer():
+    rows = [("player1", f"player{i}", i, "x" * 40) for i in range(3000)]
+    body = b"".join(msgpack.packb(row) for row in rows)
+    assert len(body) > 2 * 65_536
+
+    assert await _collect(iter_msgpack(_chunks(body))) == rows
+
+
+@pytest.mark.asyncio
+async def test_msgpack_item_split_over_chunks():
+    rows = [(i, "y" * 100) for i in range(50)]
+    body = b"".join(msgpack.packb(row) for row in rows)
+    chunks = [body[i : i + 7] for i in range(0, len(body), 7)]
+
+    assert await _collect(iter_msgpack(_chunks(*chunks))) == rows
+
+
+@pytest.mark.asyncio
+async def test_msgpack_item_too_large():
+    body = msgpack.packb(["z" * 1000])
+    with pytest.raises(RequestValidationError):
+        await _collect(iter_msgpack(_chunks(body), max_item_size=100, slice_size=64))
+
+
+@pytest.mark.asyncio
+async def test_msgpack_truncated():
+    body = msgpack.packb((1, 2, 3)) + msgpack.packb((4, 5, 6))[:-1]
+    with pytest.raises(RequestValidationError):
+        await _collect(iter_msgpack(_chunks(body)))
+
+
+@pytest.mark.asyncio
+async def test_msgpack_empty():
+    assert await _collect(iter_msgpack(_chunks())) == []
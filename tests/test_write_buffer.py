@@ -0,0 +1,159 @@
+import asyncio
+import os
+import sys
+
+import pytest
+
+sys.path.append(os.path.dirname(os.path.dirname(os.path.abspath(__file__))))
+
+from src.core.write_buffer import WriteBuffer  # noqa: E402
+
+
+class Flush:
+    """
+    Flush that records its batches, doubles every item, and waits for `release`
+    when `blocked`.
+    """
+
+    def __init__(self, blocked: bool = False, error: Exception | None = None):
+        self.batches: list[list] = []
+        self.release = asyncio.Event()
+        if not blocked:
+            self.release.set()
+        self.error = error
+
+    async def __call__(self, items: list) -> list:
+        self.batches.append(items)
+        await self.release.wait()
+        if self.error is not None:
+            raise self.error
+        return [item * 2 for item in items]
+
+
+async def running(buffer: WriteBuffer):
+    task = asyncio.create_task(buffer.run())
+    await asyncio.sleep(0)
+    return task
+
+
+@pytest.mark.asyncio
+async def test_flush_at_max_rows():
+    flush = Flush()
+    buffer = WriteBuffer("test", flush, max_rows=3, max_delay=60)
+    task = await running(buffer)
+
+    outcomes = await asyncio.wait_for(
+        asyncio.gather(*[buffer.submit(i) for i in range(3)]), timeout=1
+    )
+    assert outcomes == [0, 2, 4]
+    assert flush.batches == [[0, 1, 2]]
+    task.cancel()
+
+
+@pytest.mark.asyncio
+async def test_flush_at_max_delay():
+    flush = Flush()
+    buffer = WriteBuffer("test", flush, max_rows=100, max_delay=0.05)
+    task = await running(buffer)
+
+    loop = asyncio.get_running_loop()
+    start = loop.time()
+    assert await asyncio.wait_for(buffer.submit(1), timeout=1) == 2
+    assert loop.time() - start >= 0.04
+    assert flush.batches == [[1]]
+    task.cancel()
+
+
+@pytest.mark.asyncio
+async def test_outcome_per_caller():
+    flush = Flush()
+    buffer = WriteBuffer("test", flush, max_rows=4, max_delay=0.01)
+    task = await running(buffer)
+
+    outcomes = await asyncio.gather(*[buffer.submit(i) for i in range(10)])
+    assert outcomes == [i * 2 for i in range(10)]
+    assert all(len(batch) <= 4 for batch in flush.batches)
+    assert sum(flush.batches, []) == list(range(10))
+    task.cancel()
+
+
+@pytest.mark.asyncio
+async def test_cancelled_caller():
+    flush = Flush(blocked=True)
+    buffer = WriteBuffer("test", flush, max_rows=2, max_delay=60)
+    task = await running(buffer)
+
+    gone = asyncio.create_task(buffer.submit(1))
+    staying = asyncio.create_task(buffer.submit(2))
+    await asyncio.sleep(0.01)
+    assert flush.batches == [[1, 2]]
+
+    gone.cancel()
+    flush.release.set()
+    assert await staying == 4
+    with pytest.raises(asyncio.CancelledError):
+        await gone
+
+    # the buffer carries on
+    flush.batches.clear()
+    buffer.max_delay = 0.01
+    assert await asyncio.wait_for(buffer.submit(3), timeout=1) == 6
+    assert not task.done()
+    task.cancel()
+
+
+@pytest.mark.asyncio
+async def test_flush_error_to_every_waiter():
+    error = RuntimeError("flush failed")
+    flush = Flush(error=error)
+    buffer = WriteBuffer("test", flush, max_rows=3, max_delay=60)
+    errors = buffer.errors.value
+    task = await running(buffer)
+
+    results = await asyncio.gather(
+        *[buffer.submit(i) for i in range(3)], return_exceptions=True
+    )
+    assert results == [error, error, error]
+    assert buffer.errors.value == errors + 1
+
+    flush.error = None
+    buffer.max_delay = 0.01
+    assert await asyncio.wait_for(buffer.submit(1), timeout=1) == 2
+    task.cancel()
+
+
+@pytest.mark.asyncio
+async def test_submit_without_wait():
+    flush = Flush()
+    buffer = WriteBuffer("test", flush, max_rows=2, max_delay=60)
+    task = await running(buffer)
+
+    assert await buffer.submit(1, wait=False) is None
+    assert await buffer.submit(2, wait=False) is None
+    await asyncio.sleep(0.01)
+    assert flush.batches == [[1, 2]]
+    task.cancel()
+
+
+@pytest.mark.asyncio
+async def test_drain():
+    flush = Flush()
+    buffer = WriteBuffer("test", flush, max_rows=100, max_delay=0.01)
+    task = await running(buffer)
+
+    for i in range(5):
+        await buffer.submit(i, wait=False)
+    await buffer.drain(timeout=1)
+    assert buffer.queue.empty()
+    assert sum(flush.batches, []) == list(range(5))
+    task.cancel()
+
+
+@pytest.mark.asyncio
+async def test_drain_timeout():
+    buffer = WriteBuffer("test", Flush(), max_rows=100, max_delay=0.01)
+    await buffer.submit(1, wait=False)
+
+    # nothing flushes, drain gives up after the timeout
+    await asyncio.wait_for(buffer.drain(timeout=0.05), timeout=1)
+    assert buffer.queue.qsize() == 1